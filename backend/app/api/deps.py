@@ -6,7 +6,9 @@ Common dependencies used across API endpoints
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.core.security import get_current_user, get_current_admin_user
-from app.models.schemas import UserResponse
+from app.models.schemas import DocumentResponse, UserResponse
+from app.services.auth_service import AuthService
+from app.services.document_service import DocumentService
 
 # Security scheme
 security = HTTPBearer()
@@ -19,3 +21,19 @@ def get_current_user_dependency() -> UserResponse:
 def get_current_admin_user_dependency() -> UserResponse:
     """Get current authenticated admin user"""
     return Depends(get_current_admin_user)
+
+def get_document_or_404(
+    document_id: str,
+    current_user: UserResponse = Depends(AuthService.get_current_user)
+) -> DocumentResponse:
+    """Get a document for an authenticated caller, raising 404 when it does not exist"""
+    # current_user is resolved first, so unauthenticated callers never reach the database;
+    # FastAPI caches both dependencies for the rest of the request
+    document = DocumentService().get_document_by_id(document_id)
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    return document
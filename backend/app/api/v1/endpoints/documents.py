@@ -3,9 +3,12 @@ Documents Router
 Handles document management endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+import hashlib
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import Iterator, List, Optional
 
+from app.api.deps import get_document_or_404
 from app.models.schemas import DocumentResponse, UserResponse, AnalysisResultResponse
 from app.services.auth_service import AuthService
 from app.services.document_service import DocumentService
@@ -19,9 +22,10 @@ def get_user_documents(
     user_id: str,
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
     current_user: UserResponse = Depends(AuthService.get_current_user)
 ):
-    """Get documents for a specific user"""
+    """Get documents for a specific user; pass the X-Next-Cursor header back as `cursor` for the next page"""
     try:
         if current_user.role != "Admin" and current_user.id != user_id:
             raise HTTPException(
@@ -29,9 +33,20 @@ def get_user_documents(
                 detail="Not enough permissions"
             )
         
-        user_service = UserService()
-        documents = user_service.get_user_documents(user_id, skip, limit)
-        return documents
+        # Rows come straight from the database, so return them without re-validating
+        document_service = DocumentService()
+        try:
+            documents = document_service.get_user_documents_raw(user_id, skip, limit, cursor)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        
+        headers = {}
+        if limit > 0 and len(documents) == limit:
+            headers["X-Next-Cursor"] = document_service.next_page_cursor(documents[-1])
+        return ORJSONResponse(documents, headers=headers)
     except HTTPException:
         raise
     except Exception as e:
@@ -41,6 +56,31 @@ def get_user_documents(
         )
 
 
+def _ndjson(documents: Iterator[DocumentResponse]) -> Iterator[str]:
+    """Serialize documents as newline-delimited JSON"""
+    for document in documents:
+        yield document.json() + "\n"
+
+
+@router.get("/{user_id}/documents/stream")
+def stream_user_documents(
+    user_id: str,
+    current_user: UserResponse = Depends(AuthService.get_current_user)
+):
+    """Stream all documents for a specific user as NDJSON"""
+    if current_user.role != "Admin" and current_user.id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    document_service = DocumentService()
+    return StreamingResponse(
+        _ndjson(document_service.stream_user_documents(user_id)),
+        media_type="application/x-ndjson"
+    )
+
+
 @router.get("/{document_id}/analyses", response_model=List[AnalysisResultResponse])
 def get_document_analyses(
     document_id: str,
@@ -62,15 +102,61 @@ def get_document_analyses(
         )
 
 
+def _document_etag(document: DocumentResponse) -> str:
+    """Build an ETag from the fields that change while a document is processed"""
+    key = f"{document.id}:{document.status}:{document.progress}:{document.updated_at.isoformat()}"
+    return f'"{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag"""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+@router.get("/{document_id}", response_model=DocumentResponse)
+def get_document(
+    document_id: str,
+    request: Request,
+    response: Response,
+    current_user: UserResponse = Depends(AuthService.get_current_user),
+    document: DocumentResponse = Depends(get_document_or_404)
+):
+    """Get a document by ID, answering 304 when the client's ETag is current"""
+    try:
+        if current_user.role != "Admin" and document.user_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions"
+            )
+        
+        etag = _document_etag(document)
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        
+        response.headers["ETag"] = etag
+        return document
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving document: {str(e)}"
+        )
+
+
 @router.delete("/{document_id}")
 def delete_document(
     document_id: str,
-    current_user: UserResponse = Depends(AuthService.get_current_user)
+    current_user: UserResponse = Depends(AuthService.get_current_user),
+    document: DocumentResponse = Depends(get_document_or_404)
 ):
     """Delete a document and its associated analyses"""
     try:
         document_service = DocumentService()
-        result = document_service.delete_document(document_id, current_user)
+        result = document_service.delete_document(document_id, current_user, document=document)
         return result
     except HTTPException:
         raise
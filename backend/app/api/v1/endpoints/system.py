@@ -3,7 +3,9 @@ System Router
 Handles system health and monitoring endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 
 from app.models.schemas import UserResponse
 from app.services.auth_service import AuthService
@@ -13,11 +15,11 @@ router = APIRouter()
 
 
 @router.get("/health")
-def health_check():
-    """Health check with database connectivity"""
+async def health_check(verbose: bool = False, probe: Literal["topology", "ping", "stats"] = "topology"):
+    """Health check from driver topology state; probe=ping checks the database, probe=stats (or verbose=true) adds statistics"""
     try:
         system_service = SystemService()
-        result = system_service.health_check()
+        result = await system_service.health_check_async(verbose=verbose, probe=probe)
         return result
     except Exception as e:
         return {
@@ -26,6 +28,15 @@ def health_check():
         }
 
 
+@router.get("/metrics")
+def metrics():
+    """Prometheus metrics built from the cached health check"""
+    return Response(
+        content=SystemService().metrics(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
 @router.get("/")
 def root():
     """API root endpoint"""
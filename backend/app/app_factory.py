@@ -4,6 +4,7 @@ Creates and configures the FastAPI application with proper dependency injection
 """
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 import logging
@@ -23,6 +24,7 @@ def create_app() -> FastAPI:
         description="AI-powered financial document analysis system",
         docs_url="/docs" if settings.DEBUG else None,
         redoc_url="/redoc" if settings.DEBUG else None,
+        default_response_class=ORJSONResponse,
     )
     
     # Configure logging
@@ -62,6 +64,7 @@ def _add_middleware(app: FastAPI, settings):
         allow_credentials=True,
         allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag"],
     )
     
     # Trusted host middleware
@@ -118,6 +121,13 @@ def _add_lifecycle_events(app: FastAPI, settings):
         except Exception as e:
             logger.warning(f"Database initialization failed: {e}")
         
+        # Create security indexes once here rather than on the first request that needs them
+        try:
+            from app.services.security import get_security_service
+            get_security_service().create_indexes()
+        except Exception as e:
+            logger.warning(f"Security index creation failed: {e}")
+        
         # Initialize Redis connection
         try:
             from app.utils.redis_client import init_redis
@@ -131,6 +141,15 @@ def _add_lifecycle_events(app: FastAPI, settings):
         logger = logging.getLogger(__name__)
         logger.info("Shutting down application")
         
+        # Write buffered login attempts while the database is still reachable
+        try:
+            from app.services.security import get_security_service
+            login_attempt_batcher = getattr(get_security_service(), "login_attempt_batcher", None)
+            if login_attempt_batcher is not None:
+                login_attempt_batcher.flush()
+        except Exception as e:
+            logger.warning(f"Login attempt flush failed: {e}")
+        
         # Close database connections
         try:
             from app.repositories.connection import close_database
@@ -10,7 +10,6 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 import logging
 
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -18,6 +17,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.models.schemas import User, UserRole, UserCreate, UserLogin, UserResponse
 from app.core.database import get_mongodb_client
 from app.core.logging import get_logging_service, LogLevel, LogCategory, LogAction
+from app.services.security import password_context
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -28,9 +28,6 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # HTTP Bearer token
 security = HTTPBearer()
 
@@ -45,12 +42,12 @@ class AuthManager:
             self.users_collection = None
     
     def hash_password(self, password: str) -> str:
-        """Hash a password using bcrypt"""
-        return pwd_context.hash(password)
+        """Hash a password with the shared argon2id/bcrypt context"""
+        return password_context.hash(password)
     
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verify a password against its hash"""
-        return pwd_context.verify(plain_password, hashed_password)
+        return password_context.verify(plain_password, hashed_password)
     
     def create_access_token(self, data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
         """Create a JWT access token"""
@@ -160,19 +157,23 @@ class AuthManager:
             if not user_doc:
                 return None
             
-            if not self.verify_password(password, user_doc["password_hash"]):
+            # Deprecated (bcrypt) hashes come back re-hashed with the current scheme
+            verified, new_hash = password_context.verify_and_update(password, user_doc["password_hash"])
+            if not verified:
                 return None
             
-            # Update last login
+            # Update last login, upgrading the stored hash if needed
+            login_fields = {
+                "account.last_login": datetime.utcnow(),
+                "account.login_streak": user_doc["account"]["login_streak"] + 1,
+                "updated_at": datetime.utcnow()
+            }
+            if new_hash:
+                login_fields["password_hash"] = new_hash
+            
             self.users_collection.update_one(
                 {"_id": user_doc["_id"]},
-                {
-                    "$set": {
-                        "account.last_login": datetime.utcnow(),
-                        "account.login_streak": user_doc["account"]["login_streak"] + 1,
-                        "updated_at": datetime.utcnow()
-                    }
-                }
+                {"$set": login_fields}
             )
             
             # Add to login history
@@ -12,9 +12,26 @@ from fastapi import HTTPException
 
 from app.models.schemas import AnalysisResult, AnalysisResultResponse, AnalysisOutput, ValidationStatus
 from app.repositories.connection import get_sync_database
+from app.utils.text import HAS_DIGIT
 
 logger = logging.getLogger(__name__)
 
+# Analysis collections whose indexes this process has already created
+_indexed_collections = set()
+
+
+def create_analysis_indexes(collection) -> None:
+    """Create the indexes backing the analysis listings, once per collection per process"""
+    if collection.full_name in _indexed_collections:
+        return
+    _indexed_collections.add(collection.full_name)
+    
+    try:
+        # A user's analyses and a document's analyses, newest first
+        collection.create_index([("user_id", 1), ("created_at", -1)])
+        collection.create_index([("document_id", 1), ("created_at", -1)])
+    except Exception as e:
+        logger.warning(f"Could not create analysis indexes: {e}")
 
 class AnalysisRepository:
     """Repository for analysis data operations"""
@@ -23,12 +40,13 @@ class AnalysisRepository:
         self.db = get_sync_database()
         self.collection = self.db['analysis_results']
         self.documents_collection = self.db['documents']
+        create_analysis_indexes(self.collection)
     
     def extract_financial_data_points(self, summary_text: str) -> Dict[str, Any]:
         """Extract structured financial data points from analysis summary"""
         try:
             # Enforce 200-word limit on summary
-            words = summary_text.split()
+            words = summary_text.split(None, 200)
             if len(words) > 200:
                 summary_text = ' '.join(words[:200]) + "... [truncated to 200 words]"
             
@@ -44,20 +62,20 @@ class AnalysisRepository:
             # Financial metrics patterns
             financial_patterns = {
                 "revenue": [
-                    r"(?:revenue|sales|total revenue).*?(\$[\d,]+\.?\d*[BMK]?)",
-                    r"(?:revenue|sales).*?(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)"
+                    r"(?:revenue|sales|total revenue).*?(\$[\d,]+(?:\.\d*)?[BMK]?)",
+                    r"(?:revenue|sales).*?(?<!\d)(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)"
                 ],
                 "operating_income": [
-                    r"(?:operating income|operating profit|ebit).*?(\$[\d,]+\.?\d*[BMK]?)",
-                    r"(?:operating income|operating profit).*?(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)"
+                    r"(?:operating income|operating profit|ebit).*?(\$[\d,]+(?:\.\d*)?[BMK]?)",
+                    r"(?:operating income|operating profit).*?(?<!\d)(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)"
                 ],
                 "net_income": [
-                    r"(?:net income|net profit|net earnings).*?(\$[\d,]+\.?\d*[BMK]?)",
-                    r"(?:net income|net profit).*?(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)"
+                    r"(?:net income|net profit|net earnings).*?(\$[\d,]+(?:\.\d*)?[BMK]?)",
+                    r"(?:net income|net profit).*?(?<!\d)(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)"
                 ],
                 "cash": [
-                    r"(?:cash|cash equivalents).*?(\$[\d,]+\.?\d*[BMK]?)",
-                    r"(?:cash|cash equivalents).*?(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)"
+                    r"(?:cash|cash equivalents).*?(\$[\d,]+(?:\.\d*)?[BMK]?)",
+                    r"(?:cash|cash equivalents).*?(?<!\d)(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)"
                 ]
             }
             
@@ -117,7 +135,7 @@ class AnalysisRepository:
                 # Fallback: extract any meaningful bullet points
                 elif (line.startswith('-') or line.startswith('•')) and len(line) > 20:
                     content = line[1:].strip()
-                    if any(char.isdigit() for char in content) and len(data_points["insights"]) < 3:
+                    if HAS_DIGIT(content) is not None and len(data_points["insights"]) < 3:
                         data_points["insights"].append(content[:100])
             
             # If no insights were extracted, try to extract from the summary text directly
@@ -4,6 +4,7 @@ Handles MongoDB connection and initialization
 """
 
 import logging
+import threading
 from pymongo import MongoClient
 from app.config import get_settings
 
@@ -12,6 +13,10 @@ logger = logging.getLogger(__name__)
 # Global database client
 _client: MongoClient = None
 
+# Small dedicated client for health checks, so probes don't queue behind application traffic
+_health_client: MongoClient = None
+_health_client_lock = threading.Lock()
+
 
 def init_database():
     """Initialize database connection"""
@@ -39,11 +44,14 @@ def init_database():
 
 def close_database():
     """Close database connection"""
-    global _client
+    global _client, _health_client
     
     try:
         if _client:
             _client.close()
+        if _health_client:
+            _health_client.close()
+            _health_client = None
         logger.info("Disconnected from MongoDB")
     except Exception as e:
         logger.error(f"Error closing database connection: {e}")
@@ -63,6 +71,30 @@ def get_sync_database():
     return get_database()
 
 
+def get_healthcheck_database():
+    """Get the database through the dedicated health-check client, creating it on first use"""
+    global _health_client
+    
+    if _health_client is None:
+        with _health_client_lock:
+            if _health_client is None:
+                settings = get_settings()
+                _health_client = MongoClient(
+                    settings.MONGODB_URL,
+                    tls=True,
+                    tlsAllowInvalidCertificates=True,
+                    tlsAllowInvalidHostnames=True,
+                    maxPoolSize=2,
+                    minPoolSize=1,
+                    serverSelectionTimeoutMS=500,
+                    socketTimeoutMS=750,
+                    appname="healthcheck"
+                )
+    
+    settings = get_settings()
+    return _health_client[settings.MONGODB_DATABASE]
+
+
 def get_client():
     """Get MongoDB client"""
     if _client is None:
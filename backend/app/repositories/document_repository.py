@@ -4,16 +4,61 @@ Handles document data operations with MongoDB
 """
 
 import logging
-import hashlib
+import threading
 from datetime import datetime
-from typing import List, Optional
+from typing import Iterator, List, Optional
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import DuplicateKeyError
 
 from app.models.schemas import Document, DocumentResponse, DocumentStatus, DocumentCreate, DocumentMetadata
 from app.repositories.connection import get_sync_database
+from app.utils.checksum import calculate_file_checksum, ensure_checksum_index, find_duplicate_document, needs_duplicate_lookup
 
 logger = logging.getLogger(__name__)
 
+# Documents collections whose indexes this process has already created
+_indexed_collections = set()
+
+
+def create_document_indexes(collection) -> None:
+    """Create the indexes backing the document queries, once per collection per process"""
+    if collection.full_name in _indexed_collections:
+        return
+    _indexed_collections.add(collection.full_name)
+    
+    try:
+        # Keyset pagination over a user's documents, newest first
+        collection.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+    except Exception as e:
+        logger.warning(f"Could not create document indexes: {e}")
+    
+    # Built separately, so a failure here falls back to looking duplicates up before insert
+    ensure_checksum_index(collection)
+
+
+def encode_page_cursor(created_at: datetime, document_id: str) -> str:
+    """Keyset cursor for the page after a document: its sort key (created_at, _id)"""
+    return f"{created_at.isoformat()}_{document_id}"
+
+
+def _page_cursor_filter(cursor: str) -> dict:
+    """Filter for documents sorting after the cursor, raising ValueError for a malformed one"""
+    created_at, _, document_id = cursor.rpartition("_")
+    try:
+        if not created_at:
+            raise ValueError("expected <created_at>_<document_id>")
+        created_at = datetime.fromisoformat(created_at)
+        document_oid = ObjectId(document_id)
+    except (ValueError, InvalidId) as e:
+        raise ValueError(f"Invalid page cursor: {cursor}") from e
+    
+    # Documents sharing the boundary created_at continue by _id
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": document_oid}}
+    ]}
+
 
 class DocumentRepository:
     """Repository for document data operations"""
@@ -22,15 +67,12 @@ class DocumentRepository:
         self.db = get_sync_database()
         self.collection = self.db['documents']
         self.analysis_collection = self.db['analysis_results']
+        create_document_indexes(self.collection)
     
     def calculate_file_checksum(self, file_path: str) -> str:
-        """Calculate SHA256 checksum of a file"""
+        """Calculate the content checksum of a file (BLAKE3, or SHA256 without blake3)"""
         try:
-            sha256_hash = hashlib.sha256()
-            with open(file_path, "rb") as f:
-                for byte_block in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(byte_block)
-            return f"sha256:{sha256_hash.hexdigest()}"
+            return calculate_file_checksum(file_path)
         except Exception as e:
             logger.error(f"Error calculating checksum: {e}")
             return ""
@@ -50,15 +92,15 @@ class DocumentRepository:
             # Calculate checksum
             checksum = self.calculate_file_checksum(file_path)
             
-            # Check for duplicate documents (same user, same checksum)
-            existing_document = self.collection.find_one({
-                "user_id": ObjectId(user_id),
-                "checksum": checksum
-            })
-            
-            if existing_document:
-                logger.warning(f"Duplicate document detected for user {user_id} with checksum {checksum}")
-                return self._document_to_response(existing_document)
+            # Duplicates are caught by the unique (user_id, checksum) index on insert; a lookup
+            # is only needed without that index or while legacy checksums remain
+            if needs_duplicate_lookup(self.collection):
+                existing_document = find_duplicate_document(
+                    self.collection, ObjectId(user_id), file_path, checksum, file_size_mb
+                )
+                if existing_document:
+                    logger.warning(f"Duplicate document detected for user {user_id} with checksum {checksum}")
+                    return self._document_to_response(existing_document)
             
             # Create document
             document_data = {
@@ -83,7 +125,17 @@ class DocumentRepository:
             }
             
             # Insert document
-            result = self.collection.insert_one(document_data)
+            try:
+                result = self.collection.insert_one(document_data)
+            except DuplicateKeyError:
+                existing_document = self.collection.find_one({
+                    "user_id": ObjectId(user_id),
+                    "checksum": checksum
+                })
+                if existing_document is None:
+                    raise
+                logger.warning(f"Duplicate document detected for user {user_id} with checksum {checksum}")
+                return self._document_to_response(existing_document)
             document_data["_id"] = result.inserted_id
             
             return self._document_to_response(document_data)
@@ -92,21 +144,43 @@ class DocumentRepository:
             logger.error(f"Error creating document: {e}")
             raise
     
-    def get_user_documents(self, user_id: str, skip: int = 0, limit: int = 50) -> List[DocumentResponse]:
-        """Get documents for a specific user"""
+    def iter_user_documents(self, user_id: str, batch_size: int = 500) -> Iterator[DocumentResponse]:
+        """Yield all documents for a user, newest first, pulling them from the server in batches"""
+        cursor = self.collection.find(
+            {"user_id": ObjectId(user_id)}
+        ).sort([("created_at", -1), ("_id", -1)]).batch_size(batch_size)
+        
         try:
-            cursor = self.collection.find(
-                {"user_id": ObjectId(user_id)}
-            ).sort("created_at", -1).skip(skip).limit(limit)
-            
-            documents = []
             for doc in cursor:
-                documents.append(self._document_to_response(doc))
+                yield self._document_to_response(doc)
+        finally:
+            cursor.close()
+    
+    def get_user_documents_raw(
+        self,
+        user_id: str,
+        skip: int = 0,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> List[dict]:
+        """Get a user's documents as plain JSON-ready dicts, skipping model construction on read paths"""
+        # A malformed cursor is the caller's error, so it raises instead of returning an empty page
+        cursor_filter = _page_cursor_filter(cursor) if cursor is not None else {}
+        
+        try:
+            query = {"user_id": ObjectId(user_id), **cursor_filter}
+            
+            mongo_cursor = self.collection.find(query).sort(
+                [("created_at", -1), ("_id", -1)]
+            )
+            if cursor is None and skip:
+                mongo_cursor = mongo_cursor.skip(skip)
+            mongo_cursor = mongo_cursor.limit(limit)
             
-            return documents
+            return [self._document_to_dict(doc) for doc in mongo_cursor]
             
         except Exception as e:
-            logger.error(f"Error getting user documents: {e}")
+            logger.error(f"Error getting raw user documents: {e}")
             return []
     
     def get_document_by_id(self, document_id: str) -> Optional[DocumentResponse]:
@@ -157,6 +231,23 @@ class DocumentRepository:
             logger.error(f"Error deleting document: {e}")
             return False
     
+    def delete_document_cascade(self, document_id: str) -> Optional[int]:
+        """
+        Atomically delete a document, then its analyses.
+        
+        Returns the number of analyses deleted, or None when the document was
+        already gone (e.g. a concurrent request deleted it first), so only the
+        request that wins the delete performs the cascade.
+        """
+        deleted = self.collection.find_one_and_delete(
+            {"_id": ObjectId(document_id)},
+            projection={"_id": 1}
+        )
+        if deleted is None:
+            return None
+        
+        return self.delete_analyses_by_document_id(document_id)
+    
     def delete_analyses_by_document_id(self, document_id: str) -> int:
         """Delete all analyses associated with a document"""
         try:
@@ -167,21 +258,40 @@ class DocumentRepository:
             logger.error(f"Error deleting analyses: {e}")
             return 0
     
+    def _document_to_dict(self, doc: dict) -> dict:
+        """Convert MongoDB document to a dict shaped like DocumentResponse"""
+        return {
+            "id": str(doc["_id"]),
+            "user_id": str(doc["user_id"]),
+            "file_name": doc["file_name"],
+            "file_path": doc["file_path"],
+            "file_size_mb": doc["file_size_mb"],
+            "file_format": doc["file_format"],
+            "category": doc.get("category"),
+            "tags": doc.get("tags", []),
+            "status": doc["status"],
+            "progress": doc["progress"],
+            "processing_duration_sec": doc.get("processing_duration_sec"),
+            "analysis_ids": list(map(str, doc.get("analysis_ids", ()))),
+            "created_at": doc["created_at"],
+            "updated_at": doc["updated_at"]
+        }
+    
     def _document_to_response(self, doc: dict) -> DocumentResponse:
         """Convert MongoDB document to DocumentResponse"""
-        return DocumentResponse(
-            id=str(doc["_id"]),
-            user_id=str(doc["user_id"]),
-            file_name=doc["file_name"],
-            file_path=doc["file_path"],
-            file_size_mb=doc["file_size_mb"],
-            file_format=doc["file_format"],
-            category=doc.get("category"),
-            tags=doc.get("tags", []),
-            status=doc["status"],
-            progress=doc["progress"],
-            processing_duration_sec=doc.get("processing_duration_sec"),
-            analysis_ids=[str(aid) for aid in doc.get("analysis_ids", [])],
-            created_at=doc["created_at"],
-            updated_at=doc["updated_at"]
-        )
+        return DocumentResponse(**self._document_to_dict(doc))
+
+
+# Global document repository instance
+document_repository = None
+_document_repository_lock = threading.Lock()
+
+def get_document_repository() -> DocumentRepository:
+    """Get or create document repository instance"""
+    global document_repository
+    if document_repository is None:
+        with _document_repository_lock:
+            # Re-check under the lock so concurrent first calls build a single instance
+            if document_repository is None:
+                document_repository = DocumentRepository()
+    return document_repository
@@ -83,16 +83,20 @@ class UserRepository:
             logger.error(f"Error creating user: {e}")
             raise
     
-    def update_last_login(self, user_id: ObjectId):
-        """Update user's last login timestamp"""
+    def update_last_login(self, user_id: ObjectId, password_hash: Optional[str] = None):
+        """Update user's last login timestamp, and the password hash when it was rehashed"""
         try:
+            fields = {
+                "account.last_login": datetime.utcnow(),
+                "updated_at": datetime.utcnow()
+            }
+            if password_hash:
+                fields["password_hash"] = password_hash
+            
             self.collection.update_one(
                 {"_id": user_id},
                 {
-                    "$set": {
-                        "account.last_login": datetime.utcnow(),
-                        "updated_at": datetime.utcnow()
-                    },
+                    "$set": fields,
                     "$inc": {"account.login_streak": 1}
                 }
             )
@@ -8,7 +8,6 @@ import logging
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -16,12 +15,12 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.models.schemas import User, UserCreate, UserLogin, UserResponse, UserRole
 from app.repositories.user_repository import UserRepository
 from app.config import get_settings
+from app.services.security import password_context
 
 logger = logging.getLogger(__name__)
 
 # Security configuration
 settings = get_settings()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
 
@@ -32,12 +31,12 @@ class AuthService:
         self.user_repository = UserRepository()
     
     def hash_password(self, password: str) -> str:
-        """Hash a password using bcrypt"""
-        return pwd_context.hash(password)
+        """Hash a password with the shared argon2id/bcrypt context"""
+        return password_context.hash(password)
     
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verify a password against its hash"""
-        return pwd_context.verify(plain_password, hashed_password)
+        return password_context.verify(plain_password, hashed_password)
     
     def create_access_token(self, data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
         """Create a JWT access token"""
@@ -103,11 +102,13 @@ class AuthService:
             if not user:
                 return None
             
-            if not self.verify_password(password, user.password_hash):
+            # Deprecated (bcrypt) hashes come back re-hashed with the current scheme
+            verified, new_hash = password_context.verify_and_update(password, user.password_hash)
+            if not verified:
                 return None
             
-            # Update last login
-            self.user_repository.update_last_login(user.id)
+            # Update last login, upgrading the stored hash if needed
+            self.user_repository.update_last_login(user.id, password_hash=new_hash)
             
             return UserResponse(
                 id=str(user.id),
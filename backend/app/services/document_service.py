@@ -5,21 +5,33 @@ Handles document operations and management
 
 import logging
 import os
-from typing import List, Optional
+from typing import Iterator, List, Optional
 from pathlib import Path
 from fastapi import HTTPException
 
-from app.models.schemas import DocumentResponse, UserResponse
-from app.repositories.document_repository import DocumentRepository
+from app.models.schemas import DocumentResponse, UserResponse, UserRole
+from app.repositories.document_repository import encode_page_cursor, get_document_repository
 
 logger = logging.getLogger(__name__)
 
 
+def _deny(document: DocumentResponse, user: UserResponse) -> bool:
+    """Fallback policy for roles without an explicit entry"""
+    return False
+
+
+# Who may delete a document, keyed by the caller's role
+_DELETE_POLICY = {
+    UserRole.ADMIN: lambda document, user: True,
+    UserRole.VIEWER: lambda document, user: document.user_id == user.id,
+}
+
+
 class DocumentService:
     """Service for document operations"""
     
     def __init__(self):
-        self.document_repository = DocumentRepository()
+        self.document_repository = get_document_repository()
     
     def create_document(
         self,
@@ -43,30 +55,62 @@ class DocumentService:
                 tags=tags or []
             )
         except Exception as e:
-            logger.error(f"Error creating document: {e}")
+            logger.error("Error creating document: %s", e)
+            raise
+    
+    def stream_user_documents(self, user_id: str) -> Iterator[DocumentResponse]:
+        """
+        Stream every document for a user without materializing the full list.
+        
+        Errors are logged and re-raised, so a streaming response aborts instead of
+        ending cleanly on a partial list.
+        """
+        try:
+            yield from self.document_repository.iter_user_documents(user_id)
+        except Exception as e:
+            logger.error("Error streaming user documents: %s", e)
             raise
     
-    def get_user_documents(self, user_id: str, skip: int = 0, limit: int = 50) -> List[DocumentResponse]:
-        """Get documents for a specific user"""
+    def get_user_documents_raw(
+        self,
+        user_id: str,
+        skip: int = 0,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> List[dict]:
+        """Get documents for a user as plain dicts for listing endpoints; raises ValueError for a malformed cursor"""
         try:
-            return self.document_repository.get_user_documents(user_id, skip, limit)
+            return self.document_repository.get_user_documents_raw(user_id, skip, limit, cursor)
+        except ValueError:
+            raise
         except Exception as e:
-            logger.error(f"Error getting user documents: {e}")
+            logger.error("Error getting raw user documents: %s", e)
             return []
     
+    @staticmethod
+    def next_page_cursor(document: dict) -> str:
+        """Cursor for the page after the given listing row"""
+        return encode_page_cursor(document["created_at"], document["id"])
+    
     def get_document_by_id(self, document_id: str) -> Optional[DocumentResponse]:
         """Get a document by its ID"""
         try:
             return self.document_repository.get_document_by_id(document_id)
         except Exception as e:
-            logger.error(f"Error getting document by ID: {e}")
+            logger.error("Error getting document by ID: %s", e)
             return None
     
-    def delete_document(self, document_id: str, current_user: UserResponse) -> dict:
-        """Delete a document and its associated analyses"""
+    def delete_document(
+        self,
+        document_id: str,
+        current_user: UserResponse,
+        document: Optional[DocumentResponse] = None
+    ) -> dict:
+        """Delete a document and its associated analyses, reusing an already-fetched document if given"""
         try:
             # Get the document to check ownership
-            document = self.get_document_by_id(document_id)
+            if document is None:
+                document = self.get_document_by_id(document_id)
             if not document:
                 raise HTTPException(
                     status_code=404,
@@ -74,33 +118,31 @@ class DocumentService:
                 )
             
             # Check if user has permission to delete this document
-            if current_user.role != "Admin" and str(document.user_id) != current_user.id:
+            if not _DELETE_POLICY.get(current_user.role, _deny)(document, current_user):
                 raise HTTPException(
                     status_code=403,
                     detail="Not enough permissions to delete this document"
                 )
             
-            # Delete associated analyses first
-            deleted_analyses_count = self.document_repository.delete_analyses_by_document_id(document_id)
-            
-            # Delete the document
-            success = self.document_repository.delete_document(document_id)
+            # Delete the document and, if this request won the delete, its analyses
+            deleted_analyses_count = self.document_repository.delete_document_cascade(document_id)
             
-            if not success:
+            if deleted_analyses_count is None:
                 raise HTTPException(
-                    status_code=500,
-                    detail="Failed to delete document"
+                    status_code=404,
+                    detail="Document not found"
                 )
             
             # Try to delete the physical file
+            file_path = document.file_path
             file_deleted = False
             try:
-                if os.path.exists(document.file_path):
-                    os.remove(document.file_path)
+                if os.path.exists(file_path):
+                    os.remove(file_path)
                     file_deleted = True
-                    logger.info(f"Physical file deleted: {document.file_path}")
+                    logger.info("Physical file deleted: %s", file_path)
             except Exception as e:
-                logger.warning(f"Failed to delete physical file {document.file_path}: {e}")
+                logger.warning("Failed to delete physical file %s: %s", file_path, e)
             
             return {
                 "status": "success",
@@ -108,13 +150,13 @@ class DocumentService:
                 "document_id": document_id,
                 "deleted_analyses_count": deleted_analyses_count,
                 "file_deleted": file_deleted,
-                "file_path": document.file_path
+                "file_path": file_path
             }
             
         except HTTPException:
             raise
         except Exception as e:
-            logger.error(f"Error deleting document {document_id}: {e}")
+            logger.error("Error deleting document %s: %s", document_id, e)
             raise HTTPException(
                 status_code=500,
                 detail=f"Error deleting document: {str(e)}"
@@ -125,5 +167,5 @@ class DocumentService:
         try:
             return self.document_repository.update_document_status(document_id, status, progress, processing_duration)
         except Exception as e:
-            logger.error(f"Error updating document status: {e}")
+            logger.error("Error updating document status: %s", e)
             return False
@@ -7,35 +7,41 @@ import os
 import io
 import json
 import csv
-from typing import Dict, Any, List, Optional, Union
-from datetime import datetime
+import hashlib
+import importlib.util
+import time
+from typing import Dict, Any, Iterable, List, Optional, Union
+from datetime import datetime, timedelta
 import logging
 from pathlib import Path
 import zipfile
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
 
-# PDF and Excel export dependencies
-try:
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch
-    from reportlab.lib import colors
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-    REPORTLAB_AVAILABLE = True
-except ImportError:
-    REPORTLAB_AVAILABLE = False
+# PDF and Excel export dependencies are probed here but imported on first use,
+# so processes that never export don't pay for loading them
+REPORTLAB_AVAILABLE = importlib.util.find_spec("reportlab") is not None
+if not REPORTLAB_AVAILABLE:
     logging.warning("ReportLab not available. PDF export will be limited.")
 
+PANDAS_AVAILABLE = importlib.util.find_spec("pandas") is not None
+if not PANDAS_AVAILABLE:
+    logging.warning("Pandas not available. Tabular exports will be limited.")
+
+XLSXWRITER_AVAILABLE = importlib.util.find_spec("xlsxwriter") is not None
+if not XLSXWRITER_AVAILABLE:
+    logging.warning("XlsxWriter not available. Excel export will be limited.")
+
 try:
-    import pandas as pd
-    import openpyxl
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from openpyxl.utils.dataframe import dataframe_to_rows
-    PANDAS_AVAILABLE = True
+    import orjson
+    ORJSON_AVAILABLE = True
 except ImportError:
-    PANDAS_AVAILABLE = False
-    logging.warning("Pandas/OpenPyXL not available. Excel export will be limited.")
+    ORJSON_AVAILABLE = False
+    logging.warning("orjson not available. JSON export will use the standard library encoder.")
+
+from bson import ObjectId
 
 from app.core.database import get_mongodb_client
 from app.models.schemas import LogLevel, LogCategory, LogAction
@@ -43,6 +49,113 @@ from app.models.schemas import LogLevel, LogCategory, LogAction
 # Set up logging
 logger = logging.getLogger(__name__)
 
+
+def _normalize(value: Any) -> Any:
+    """Convert ObjectIds (and, for the stdlib encoder, datetimes) to strings ahead of encoding"""
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, ObjectId):
+        return str(value)
+    if not ORJSON_AVAILABLE and isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _dumps_json(data: Any) -> bytes:
+    """Serialize export data to indented UTF-8 JSON, using orjson when available"""
+    data = _normalize(data)
+    # default=str only remains as a safety net for types _normalize doesn't know about
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str)
+    return json.dumps(data, indent=2, default=str).encode('utf-8')
+
+
+# Report styles, built on first PDF export
+_report_styles = None
+_report_styles_lock = threading.Lock()
+
+
+def _get_report_styles() -> SimpleNamespace:
+    """Import ReportLab's style machinery and build the shared report styles once per process"""
+    global _report_styles
+    if _report_styles is not None:
+        return _report_styles
+    
+    with _report_styles_lock:
+        if _report_styles is not None:
+            return _report_styles
+        
+        from reportlab.lib import colors
+        from reportlab.lib.enums import TA_CENTER
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.platypus import TableStyle
+        
+        base = getSampleStyleSheet()
+        _report_styles = SimpleNamespace(
+            base=base,
+            title=ParagraphStyle(
+                'CustomTitle',
+                parent=base['Heading1'],
+                fontSize=18,
+                spaceAfter=30,
+                alignment=TA_CENTER,
+                textColor=colors.darkblue
+            ),
+            footer=ParagraphStyle(
+                'Footer',
+                parent=base['Normal'],
+                fontSize=8,
+                alignment=TA_CENTER,
+                textColor=colors.grey
+            ),
+            info_table=TableStyle([
+                ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 0), (-1, -1), 10),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+                ('BACKGROUND', (1, 0), (1, -1), colors.beige),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black)
+            ]),
+            metrics_table=TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 12),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black)
+            ])
+        )
+    return _report_styles
+
+# History record fields and the column headers they are exported under
+HISTORY_EXPORT_COLUMNS = {
+    'created_at': 'Date',
+    'filename': 'Document Name',
+    'status': 'Status',
+    'analysis_type': 'Analysis Type',
+    'risk_level': 'Risk Level',
+    'recommendation': 'Recommendation'
+}
+
+# Below this many stale files a thread pool costs more than it saves
+PARALLEL_UNLINK_THRESHOLD = 32
+
+
+def _unlink_quietly(path: str) -> bool:
+    """Remove a file, returning False if it was already gone"""
+    try:
+        os.unlink(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
 class ExportService:
     """Service for exporting analysis results and reports"""
     
@@ -55,144 +168,74 @@ class ExportService:
         from app.core.logging import get_logging_service
         self.logging_service = get_logging_service()
     
+    def _content_key(self, analysis_data: Dict[str, Any], generated_at: datetime) -> str:
+        """Hash a canonical JSON form of everything a rendered report depends on"""
+        canonical = json.dumps([analysis_data, generated_at], sort_keys=True, default=str)
+        return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _get_cached_artifact(self, content_key: str, extension: str) -> Optional[Path]:
+        """Return a previously rendered artifact for this content, if it is still on disk"""
+        filepath = self.export_dir / f"analysis_report_{content_key}.{extension}"
+        return filepath if filepath.exists() else None
+    
+    def _write_atomic(self, filepath: Path, data: bytes) -> None:
+        """Write to a temp file beside filepath and rename it into place, so readers never see a partial file"""
+        fd, tmp_name = tempfile.mkstemp(dir=filepath.parent, prefix=f".{filepath.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_name, filepath)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+            raise
+    
     def export_analysis_to_pdf(
         self,
         analysis_data: Dict[str, Any],
         user_id: str,
-        filename: Optional[str] = None
+        filename: Optional[str] = None,
+        generated_at: Optional[datetime] = None
     ) -> str:
-        """Export analysis results to PDF format"""
+        """
+        Export analysis results to PDF format.
+        
+        generated_at is the time the analysis was produced, stamped as the analysis
+        date; pass the stored analysis' created_at so repeated exports are identical.
+        """
         try:
-            if not REPORTLAB_AVAILABLE:
-                raise Exception("ReportLab not available for PDF export")
-            
-            if not filename:
+            # Unnamed exports of a dated analysis are content-addressed, so identical
+            # analyses render once; undated ones are stamped now and rendered each time
+            if generated_at is not None and not filename:
+                content_key = self._content_key(analysis_data, generated_at)
+                cached_path = self._get_cached_artifact(content_key, "pdf")
+                if cached_path is not None:
+                    self.logging_service.log_activity(
+                        level=LogLevel.INFO,
+                        category=LogCategory.EXPORT,
+                        action=LogAction.EXPORT,
+                        message=f"Analysis exported to PDF (cached): {cached_path.name}",
+                        user_id=user_id,
+                        details={
+                            "export_type": "pdf",
+                            "filename": cached_path.name,
+                            "cached": True
+                        }
+                    )
+                    return str(cached_path)
+                filename = f"analysis_report_{content_key}.pdf"
+            elif not filename:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 filename = f"analysis_report_{timestamp}.pdf"
             
             filepath = self.export_dir / filename
             
-            # Create PDF document
-            doc = SimpleDocTemplate(str(filepath), pagesize=A4)
-            styles = getSampleStyleSheet()
-            story = []
-            
-            # Title
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=18,
-                spaceAfter=30,
-                alignment=TA_CENTER,
-                textColor=colors.darkblue
-            )
-            story.append(Paragraph("Financial Document Analysis Report", title_style))
-            story.append(Spacer(1, 12))
-            
-            # Document information
-            doc_info = analysis_data.get('document_info', {})
-            if doc_info:
-                story.append(Paragraph("Document Information", styles['Heading2']))
-                info_data = [
-                    ['Document Name:', doc_info.get('filename', 'N/A')],
-                    ['Upload Date:', doc_info.get('upload_date', 'N/A')],
-                    ['File Size:', f"{doc_info.get('file_size', 0)} bytes"],
-                    ['Analysis Date:', datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
-                ]
-                info_table = Table(info_data, colWidths=[2*inch, 4*inch])
-                info_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 10),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-                    ('BACKGROUND', (1, 0), (1, -1), colors.beige),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                ]))
-                story.append(info_table)
-                story.append(Spacer(1, 20))
-            
-            # Executive Summary
-            summary = analysis_data.get('executive_summary', '')
-            if summary:
-                story.append(Paragraph("Executive Summary", styles['Heading2']))
-                story.append(Paragraph(summary, styles['Normal']))
-                story.append(Spacer(1, 20))
-            
-            # Financial Analysis
-            financial_analysis = analysis_data.get('financial_analysis', {})
-            if financial_analysis:
-                story.append(Paragraph("Financial Analysis", styles['Heading2']))
-                
-                # Key metrics table
-                metrics = financial_analysis.get('key_metrics', {})
-                if metrics:
-                    story.append(Paragraph("Key Financial Metrics", styles['Heading3']))
-                    metrics_data = [['Metric', 'Value', 'Analysis']]
-                    for metric, value in metrics.items():
-                        metrics_data.append([metric, str(value), ''])
-                    
-                    metrics_table = Table(metrics_data, colWidths=[2*inch, 1.5*inch, 2.5*inch])
-                    metrics_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, 0), 12),
-                        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                    ]))
-                    story.append(metrics_table)
-                    story.append(Spacer(1, 20))
-            
-            # Risk Assessment
-            risk_assessment = analysis_data.get('risk_assessment', {})
-            if risk_assessment:
-                story.append(Paragraph("Risk Assessment", styles['Heading2']))
-                risk_level = risk_assessment.get('risk_level', 'N/A')
-                risk_factors = risk_assessment.get('risk_factors', [])
-                
-                story.append(Paragraph(f"Overall Risk Level: {risk_level}", styles['Normal']))
-                if risk_factors:
-                    story.append(Paragraph("Risk Factors:", styles['Heading3']))
-                    for factor in risk_factors:
-                        story.append(Paragraph(f"• {factor}", styles['Normal']))
-                story.append(Spacer(1, 20))
-            
-            # Investment Recommendations
-            recommendations = analysis_data.get('investment_recommendations', {})
-            if recommendations:
-                story.append(Paragraph("Investment Recommendations", styles['Heading2']))
-                recommendation = recommendations.get('recommendation', '')
-                confidence = recommendations.get('confidence', 'N/A')
-                
-                story.append(Paragraph(f"Recommendation: {recommendation}", styles['Normal']))
-                story.append(Paragraph(f"Confidence Level: {confidence}", styles['Normal']))
-                story.append(Spacer(1, 20))
-            
-            # Detailed Analysis
-            detailed_analysis = analysis_data.get('detailed_analysis', '')
-            if detailed_analysis:
-                story.append(Paragraph("Detailed Analysis", styles['Heading2']))
-                story.append(Paragraph(detailed_analysis, styles['Normal']))
-                story.append(Spacer(1, 20))
-            
-            # Footer
-            story.append(Spacer(1, 30))
-            footer_style = ParagraphStyle(
-                'Footer',
-                parent=styles['Normal'],
-                fontSize=8,
-                alignment=TA_CENTER,
-                textColor=colors.grey
-            )
-            story.append(Paragraph(f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", footer_style))
-            story.append(Paragraph("Financial Document Analyzer", footer_style))
-            
-            # Build PDF
-            doc.build(story)
+            # Render in memory, then write to disk once; the rename keeps a concurrent
+            # export of the same content from serving a half-written cached file
+            pdf_bytes = self._render_pdf_bytes(analysis_data, generated_at)
+            self._write_atomic(filepath, pdf_bytes)
             
             # Log export activity
             self.logging_service.log_activity(
@@ -204,7 +247,7 @@ class ExportService:
                 details={
                     "export_type": "pdf",
                     "filename": filename,
-                    "file_size": filepath.stat().st_size
+                    "file_size": len(pdf_bytes)
                 }
             )
             
@@ -221,105 +264,176 @@ class ExportService:
             )
             raise
     
+    def _render_pdf_bytes(self, analysis_data: Dict[str, Any], generated_at: Optional[datetime] = None) -> bytes:
+        """Render the analysis report as PDF bytes without touching the export directory"""
+        if not REPORTLAB_AVAILABLE:
+            raise Exception("ReportLab not available for PDF export")
+        
+        from reportlab.lib.pagesizes import A4
+        from reportlab.platypus import SimpleDocTemplate
+        
+        # Create PDF document in memory
+        pdf_buffer = io.BytesIO()
+        doc = SimpleDocTemplate(pdf_buffer, pagesize=A4)
+        story = self._build_pdf_story(analysis_data, (generated_at or datetime.now()).strftime("%Y-%m-%d %H:%M:%S"))
+        
+        # Build PDF
+        doc.build(story)
+        return pdf_buffer.getvalue()
+    
+    def _build_pdf_story(self, analysis_data: Dict[str, Any], generated_at: str) -> List[Any]:
+        """Build the report flowables for an analysis, with styles resolved once up front"""
+        from reportlab.lib.units import inch
+        from reportlab.platypus import Paragraph, Spacer, Table
+        
+        report_styles = _get_report_styles()
+        heading2 = report_styles.base['Heading2']
+        heading3 = report_styles.base['Heading3']
+        normal = report_styles.base['Normal']
+        footer = report_styles.footer
+        story = []
+        
+        # Title
+        story.extend((
+            Paragraph("Financial Document Analysis Report", report_styles.title),
+            Spacer(1, 12)
+        ))
+        
+        # Document information
+        doc_info = analysis_data.get('document_info', {})
+        if doc_info:
+            info_data = [
+                ['Document Name:', doc_info.get('filename', 'N/A')],
+                ['Upload Date:', doc_info.get('upload_date', 'N/A')],
+                ['File Size:', f"{doc_info.get('file_size', 0)} bytes"],
+                ['Analysis Date:', generated_at]
+            ]
+            info_table = Table(info_data, colWidths=[2*inch, 4*inch])
+            info_table.setStyle(report_styles.info_table)
+            story.extend((
+                Paragraph("Document Information", heading2),
+                info_table,
+                Spacer(1, 20)
+            ))
+        
+        # Executive Summary
+        summary = analysis_data.get('executive_summary', '')
+        if summary:
+            story.extend((
+                Paragraph("Executive Summary", heading2),
+                Paragraph(summary, normal),
+                Spacer(1, 20)
+            ))
+        
+        # Financial Analysis
+        financial_analysis = analysis_data.get('financial_analysis', {})
+        if financial_analysis:
+            story.append(Paragraph("Financial Analysis", heading2))
+            
+            # Key metrics table
+            metrics = financial_analysis.get('key_metrics', {})
+            if metrics:
+                metrics_data = [['Metric', 'Value', 'Analysis']]
+                metrics_data.extend([metric, str(value), ''] for metric, value in metrics.items())
+                
+                metrics_table = Table(metrics_data, colWidths=[2*inch, 1.5*inch, 2.5*inch])
+                metrics_table.setStyle(report_styles.metrics_table)
+                story.extend((
+                    Paragraph("Key Financial Metrics", heading3),
+                    metrics_table,
+                    Spacer(1, 20)
+                ))
+        
+        # Risk Assessment
+        risk_assessment = analysis_data.get('risk_assessment', {})
+        if risk_assessment:
+            risk_level = risk_assessment.get('risk_level', 'N/A')
+            risk_factors = risk_assessment.get('risk_factors', [])
+            
+            story.extend((
+                Paragraph("Risk Assessment", heading2),
+                Paragraph(f"Overall Risk Level: {risk_level}", normal)
+            ))
+            if risk_factors:
+                story.append(Paragraph("Risk Factors:", heading3))
+                story.extend(Paragraph(f"• {factor}", normal) for factor in risk_factors)
+            story.append(Spacer(1, 20))
+        
+        # Investment Recommendations
+        recommendations = analysis_data.get('investment_recommendations', {})
+        if recommendations:
+            recommendation = recommendations.get('recommendation', '')
+            confidence = recommendations.get('confidence', 'N/A')
+            
+            story.extend((
+                Paragraph("Investment Recommendations", heading2),
+                Paragraph(f"Recommendation: {recommendation}", normal),
+                Paragraph(f"Confidence Level: {confidence}", normal),
+                Spacer(1, 20)
+            ))
+        
+        # Detailed Analysis
+        detailed_analysis = analysis_data.get('detailed_analysis', '')
+        if detailed_analysis:
+            story.extend((
+                Paragraph("Detailed Analysis", heading2),
+                Paragraph(detailed_analysis, normal),
+                Spacer(1, 20)
+            ))
+        
+        # Footer
+        story.extend((
+            Spacer(1, 30),
+            Paragraph(f"Generated on {generated_at}", footer),
+            Paragraph("Financial Document Analyzer", footer)
+        ))
+        
+        return story
+    
     def export_analysis_to_excel(
         self,
         analysis_data: Dict[str, Any],
         user_id: str,
-        filename: Optional[str] = None
+        filename: Optional[str] = None,
+        generated_at: Optional[datetime] = None
     ) -> str:
-        """Export analysis results to Excel format"""
+        """
+        Export analysis results to Excel format.
+        
+        generated_at is the time the analysis was produced, stamped as the analysis
+        date; pass the stored analysis' created_at so repeated exports are identical.
+        """
         try:
-            if not PANDAS_AVAILABLE:
-                raise Exception("Pandas/OpenPyXL not available for Excel export")
-            
-            if not filename:
+            # Unnamed exports of a dated analysis are content-addressed, so identical
+            # analyses render once; undated ones are stamped now and rendered each time
+            if generated_at is not None and not filename:
+                content_key = self._content_key(analysis_data, generated_at)
+                cached_path = self._get_cached_artifact(content_key, "xlsx")
+                if cached_path is not None:
+                    self.logging_service.log_activity(
+                        level=LogLevel.INFO,
+                        category=LogCategory.EXPORT,
+                        action=LogAction.EXPORT,
+                        message=f"Analysis exported to Excel (cached): {cached_path.name}",
+                        user_id=user_id,
+                        details={
+                            "export_type": "excel",
+                            "filename": cached_path.name,
+                            "cached": True
+                        }
+                    )
+                    return str(cached_path)
+                filename = f"analysis_report_{content_key}.xlsx"
+            elif not filename:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 filename = f"analysis_report_{timestamp}.xlsx"
             
             filepath = self.export_dir / filename
             
-            # Create Excel workbook
-            wb = openpyxl.Workbook()
-            
-            # Remove default sheet
-            wb.remove(wb.active)
-            
-            # Document Information Sheet
-            doc_sheet = wb.create_sheet("Document Information")
-            doc_info = analysis_data.get('document_info', {})
-            doc_data = [
-                ['Document Name', doc_info.get('filename', 'N/A')],
-                ['Upload Date', doc_info.get('upload_date', 'N/A')],
-                ['File Size (bytes)', doc_info.get('file_size', 0)],
-                ['Analysis Date', datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
-            ]
-            
-            for row in doc_data:
-                doc_sheet.append(row)
-            
-            # Style the document info sheet
-            self._style_excel_sheet(doc_sheet, "Document Information")
-            
-            # Executive Summary Sheet
-            summary_sheet = wb.create_sheet("Executive Summary")
-            summary = analysis_data.get('executive_summary', '')
-            summary_sheet.append(['Executive Summary'])
-            summary_sheet.append([summary])
-            self._style_excel_sheet(summary_sheet, "Executive Summary")
-            
-            # Financial Analysis Sheet
-            financial_analysis = analysis_data.get('financial_analysis', {})
-            if financial_analysis:
-                fin_sheet = wb.create_sheet("Financial Analysis")
-                
-                # Key metrics
-                metrics = financial_analysis.get('key_metrics', {})
-                if metrics:
-                    fin_sheet.append(['Key Financial Metrics'])
-                    fin_sheet.append(['Metric', 'Value', 'Analysis'])
-                    
-                    for metric, value in metrics.items():
-                        fin_sheet.append([metric, value, ''])
-                    
-                    self._style_excel_sheet(fin_sheet, "Financial Analysis")
-            
-            # Risk Assessment Sheet
-            risk_assessment = analysis_data.get('risk_assessment', {})
-            if risk_assessment:
-                risk_sheet = wb.create_sheet("Risk Assessment")
-                
-                risk_sheet.append(['Risk Assessment'])
-                risk_sheet.append(['Overall Risk Level', risk_assessment.get('risk_level', 'N/A')])
-                risk_sheet.append([''])
-                risk_sheet.append(['Risk Factors'])
-                
-                risk_factors = risk_assessment.get('risk_factors', [])
-                for factor in risk_factors:
-                    risk_sheet.append([factor])
-                
-                self._style_excel_sheet(risk_sheet, "Risk Assessment")
-            
-            # Investment Recommendations Sheet
-            recommendations = analysis_data.get('investment_recommendations', {})
-            if recommendations:
-                rec_sheet = wb.create_sheet("Investment Recommendations")
-                
-                rec_sheet.append(['Investment Recommendations'])
-                rec_sheet.append(['Recommendation', recommendations.get('recommendation', '')])
-                rec_sheet.append(['Confidence Level', recommendations.get('confidence', 'N/A')])
-                
-                self._style_excel_sheet(rec_sheet, "Investment Recommendations")
-            
-            # Detailed Analysis Sheet
-            detailed_analysis = analysis_data.get('detailed_analysis', '')
-            if detailed_analysis:
-                detail_sheet = wb.create_sheet("Detailed Analysis")
-                detail_sheet.append(['Detailed Analysis'])
-                detail_sheet.append([detailed_analysis])
-                self._style_excel_sheet(detail_sheet, "Detailed Analysis")
-            
-            # Save workbook
-            wb.save(str(filepath))
+            # Render in memory, then write to disk once; the rename keeps a concurrent
+            # export of the same content from serving a half-written cached file
+            excel_bytes = self._render_excel_bytes(analysis_data, generated_at)
+            self._write_atomic(filepath, excel_bytes)
             
             # Log export activity
             self.logging_service.log_activity(
@@ -331,7 +445,7 @@ class ExportService:
                 details={
                     "export_type": "excel",
                     "filename": filename,
-                    "file_size": filepath.stat().st_size
+                    "file_size": len(excel_bytes)
                 }
             )
             
@@ -348,6 +462,86 @@ class ExportService:
             )
             raise
     
+    def _render_excel_bytes(self, analysis_data: Dict[str, Any], generated_at: Optional[datetime] = None) -> bytes:
+        """Render the analysis workbook as XLSX bytes without touching the export directory"""
+        if not XLSXWRITER_AVAILABLE:
+            raise Exception("XlsxWriter not available for Excel export")
+        
+        # Create Excel workbook
+        excel_buffer = io.BytesIO()
+        workbook = self._new_excel_workbook(excel_buffer)
+        formats = self._excel_formats(workbook)
+        
+        # Document Information Sheet
+        doc_info = analysis_data.get('document_info', {})
+        doc_data = [
+            ['Document Name', doc_info.get('filename', 'N/A')],
+            ['Upload Date', doc_info.get('upload_date', 'N/A')],
+            ['File Size (bytes)', doc_info.get('file_size', 0)],
+            ['Analysis Date', (generated_at or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")]
+        ]
+        self._write_excel_sheet(workbook, formats, "Document Information", doc_data)
+        
+        # Executive Summary Sheet
+        summary = analysis_data.get('executive_summary', '')
+        self._write_excel_sheet(workbook, formats, "Executive Summary", [
+            ['Executive Summary'],
+            [summary]
+        ])
+        
+        # Financial Analysis Sheet
+        financial_analysis = analysis_data.get('financial_analysis', {})
+        if financial_analysis:
+            fin_rows = []
+            
+            # Key metrics
+            metrics = financial_analysis.get('key_metrics', {})
+            if metrics:
+                fin_rows.append(['Key Financial Metrics'])
+                fin_rows.append(['Metric', 'Value', 'Analysis'])
+                
+                for metric, value in metrics.items():
+                    fin_rows.append([metric, value, ''])
+            
+            self._write_excel_sheet(workbook, formats, "Financial Analysis", fin_rows)
+        
+        # Risk Assessment Sheet
+        risk_assessment = analysis_data.get('risk_assessment', {})
+        if risk_assessment:
+            risk_rows = [
+                ['Risk Assessment'],
+                ['Overall Risk Level', risk_assessment.get('risk_level', 'N/A')],
+                [''],
+                ['Risk Factors']
+            ]
+            
+            risk_factors = risk_assessment.get('risk_factors', [])
+            for factor in risk_factors:
+                risk_rows.append([factor])
+            
+            self._write_excel_sheet(workbook, formats, "Risk Assessment", risk_rows)
+        
+        # Investment Recommendations Sheet
+        recommendations = analysis_data.get('investment_recommendations', {})
+        if recommendations:
+            self._write_excel_sheet(workbook, formats, "Investment Recommendations", [
+                ['Investment Recommendations'],
+                ['Recommendation', recommendations.get('recommendation', '')],
+                ['Confidence Level', recommendations.get('confidence', 'N/A')]
+            ])
+        
+        # Detailed Analysis Sheet
+        detailed_analysis = analysis_data.get('detailed_analysis', '')
+        if detailed_analysis:
+            self._write_excel_sheet(workbook, formats, "Detailed Analysis", [
+                ['Detailed Analysis'],
+                [detailed_analysis]
+            ])
+        
+        # Save workbook
+        workbook.close()
+        return excel_buffer.getvalue()
+    
     def export_dashboard_data(
         self,
         dashboard_data: Dict[str, Any],
@@ -384,23 +578,29 @@ class ExportService:
     ) -> str:
         """Export user's analysis history"""
         try:
-            if not self.mongodb_client.db:
+            if self.mongodb_client.db is None:
                 raise Exception("MongoDB not available")
             
             # Get user's analysis history
             end_date = datetime.utcnow()
-            start_date = datetime(end_date.year, end_date.month, end_date.day - days)
-            
-            history = list(self.mongodb_client.db['document_analyses'].find({
-                'user_id': user_id,
-                'created_at': {'$gte': start_date, '$lte': end_date}
-            }).sort('created_at', -1))
+            start_date = end_date - timedelta(days=days)
+            
+            # Fetch only the exported fields, in network-sized batches
+            cursor = self.mongodb_client.db['document_analyses'].find(
+                {
+                    'user_id': user_id,
+                    'created_at': {'$gte': start_date, '$lte': end_date}
+                },
+                projection={**{field: 1 for field in HISTORY_EXPORT_COLUMNS}, '_id': 0}
+            ).sort('created_at', -1).batch_size(500)
+            history = list(cursor)
             
             if not history:
                 raise Exception("No analysis history found for the specified period")
             
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"user_history_{user_id}_{timestamp}.{format_type}"
+            extension = "xlsx" if format_type.lower() == "excel" else format_type.lower()
+            filename = f"user_history_{user_id}_{timestamp}.{extension}"
             filepath = self.export_dir / filename
             
             if format_type.lower() == "excel":
@@ -426,19 +626,30 @@ class ExportService:
             zip_filename = f"analysis_package_{timestamp}.zip"
             zip_filepath = self.export_dir / zip_filename
             
-            with zipfile.ZipFile(zip_filepath, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # Add different format exports
+            # Every format is rendered in memory and written straight into the archive
+            renderers = {
+                "pdf": self._render_pdf_bytes,
+                "excel": self._render_excel_bytes,
+                "json": lambda data: self._build_analysis_json(data, user_id)
+            }
+            
+            with zipfile.ZipFile(zip_filepath, 'w', zipfile.ZIP_STORED) as zipf:
+                # Add different format exports, in the requested order
                 for format_type in include_formats:
+                    if format_type not in renderers:
+                        continue
                     try:
-                        if format_type == "pdf":
-                            pdf_path = self.export_analysis_to_pdf(analysis_data, user_id)
-                            zipf.write(pdf_path, f"analysis_report.{format_type}")
-                        elif format_type == "excel":
-                            excel_path = self.export_analysis_to_excel(analysis_data, user_id)
-                            zipf.write(excel_path, f"analysis_report.{format_type}")
-                        elif format_type == "json":
-                            json_path = self._export_analysis_to_json(analysis_data, user_id)
-                            zipf.write(json_path, f"analysis_report.{format_type}")
+                        rendered = renderers[format_type](analysis_data)
+                        if format_type == "json":
+                            zipf.writestr(
+                                f"analysis_report.{format_type}",
+                                rendered,
+                                compress_type=zipfile.ZIP_DEFLATED,
+                                compresslevel=1
+                            )
+                        else:
+                            # PDF and XLSX are already deflate-compressed internally
+                            zipf.writestr(f"analysis_report.{format_type}", rendered)
                     except Exception as e:
                         logger.warning(f"Could not add {format_type} to export package: {e}")
                 
@@ -455,7 +666,12 @@ This package contains the analysis results in multiple formats:
 
 For questions or support, please contact the system administrator.
 """
-                zipf.writestr("README.txt", readme_content)
+                zipf.writestr(
+                    "README.txt",
+                    readme_content,
+                    compress_type=zipfile.ZIP_DEFLATED,
+                    compresslevel=1
+                )
             
             # Log export activity
             self.logging_service.log_activity(
@@ -478,55 +694,91 @@ For questions or support, please contact the system administrator.
             logger.error(f"Error creating export package: {e}")
             raise
     
-    def _style_excel_sheet(self, sheet, title: str):
-        """Apply styling to Excel sheet"""
+    def _new_excel_workbook(self, target: Union[str, io.BytesIO]):
+        """Create an XlsxWriter workbook with the export's shared options"""
+        import xlsxwriter
+        
+        # Report workbooks are small and built from in-memory rows, so the default mode (with
+        # shared strings) is kept; constant_memory would save nothing here
+        return xlsxwriter.Workbook(target, {
+            'strings_to_numbers': False,
+            'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+            'remove_timezone': True
+        })
+    
+    def _excel_formats(self, workbook) -> Dict[str, Any]:
+        """Create the title and header cell formats for a workbook"""
+        return {
+            'title': workbook.add_format({
+                'bold': True,
+                'font_size': 14,
+                'font_color': '#FFFFFF',
+                'bg_color': '#366092',
+                'align': 'center',
+                'valign': 'vcenter'
+            }),
+            'header': workbook.add_format({
+                'bold': True,
+                'bg_color': '#D9E1F2',
+                'align': 'center'
+            })
+        }
+    
+    def _write_excel_sheet(self, workbook, formats: Dict[str, Any], title: str, rows: List[List[Any]]):
+        """Write rows to a new worksheet, styling the title and header rows as they are written"""
+        sheet = workbook.add_worksheet(title)
+        
+        # Formats are applied as each cell is written
+        for row_index, row in enumerate(rows):
+            if row_index == 0:
+                sheet.write_row(row_index, 0, row[:1], formats['title'])
+                sheet.write_row(row_index, 1, row[1:])
+            elif row_index == 1:
+                sheet.write_row(row_index, 0, row, formats['header'])
+            else:
+                sheet.write_row(row_index, 0, row)
+        
+        self._style_excel_sheet(sheet, rows)
+        return sheet
+    
+    def _style_excel_sheet(self, sheet, rows: List[List[Any]]):
+        """Size Excel sheet columns to fit their contents"""
         try:
-            # Title styling
-            title_cell = sheet['A1']
-            title_cell.font = Font(bold=True, size=14, color="FFFFFF")
-            title_cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            title_cell.alignment = Alignment(horizontal="center", vertical="center")
-            
-            # Header styling
-            for row in sheet.iter_rows(min_row=2, max_row=2):
-                for cell in row:
-                    cell.font = Font(bold=True)
-                    cell.fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
-                    cell.alignment = Alignment(horizontal="center")
-            
-            # Auto-adjust column widths
-            for column in sheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
+            # Auto-adjust column widths from the longest value per column, in one pass over the rows
+            widths = [0] * max((len(row) for row in rows), default=0)
+            for row in rows:
+                for column_index, value in enumerate(row):
+                    if value is None:
+                        continue
+                    # Most cells are already strings; skip the str() copy for them
+                    length = len(value) if type(value) is str else len(str(value))
+                    if length > widths[column_index]:
+                        widths[column_index] = length
+            
+            for column_index, max_length in enumerate(widths):
                 adjusted_width = min(max_length + 2, 50)
-                sheet.column_dimensions[column_letter].width = adjusted_width
+                sheet.set_column(column_index, column_index, adjusted_width)
                 
         except Exception as e:
             logger.warning(f"Could not apply Excel styling: {e}")
     
     def _export_dashboard_to_excel(self, data: Dict[str, Any], filepath: Path, user_id: str) -> str:
         """Export dashboard data to Excel"""
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Dashboard Data"
+        workbook = self._new_excel_workbook(str(filepath))
         
         # Add dashboard data
-        ws.append(['Dashboard Data Export'])
-        ws.append(['Generated:', datetime.now().strftime('%Y-%m-%d %H:%M:%S')])
-        ws.append([''])
+        rows = [
+            ['Dashboard Data Export'],
+            ['Generated:', datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
+            ['']
+        ]
         
         # Add various dashboard metrics
         for key, value in data.items():
-            ws.append([key, str(value)])
+            rows.append([key, str(value)])
         
-        self._style_excel_sheet(ws, "Dashboard Data")
-        wb.save(str(filepath))
+        self._write_excel_sheet(workbook, self._excel_formats(workbook), "Dashboard Data", rows)
+        workbook.close()
         
         return str(filepath)
     
@@ -551,63 +803,63 @@ For questions or support, please contact the system administrator.
             'data': data
         }
         
-        with open(filepath, 'w', encoding='utf-8') as jsonfile:
-            json.dump(export_data, jsonfile, indent=2, default=str)
+        filepath.write_bytes(_dumps_json(export_data))
         
         return str(filepath)
     
+    def _history_frame(self, history: Iterable[Dict]) -> "pd.DataFrame":
+        """Project analysis history records onto the export columns"""
+        if not PANDAS_AVAILABLE:
+            raise Exception("Pandas not available for history export")
+        
+        import pandas as pd
+        
+        # Gather one list per column so pandas infers each column's dtype in bulk
+        records = list(history)
+        columns = {
+            header: [record.get(field, '') for record in records]
+            for field, header in HISTORY_EXPORT_COLUMNS.items()
+        }
+        return pd.DataFrame(columns).fillna('')
+    
     def _export_history_to_excel(self, history: List[Dict], filepath: Path, user_id: str) -> str:
         """Export user history to Excel"""
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Analysis History"
-        
-        # Headers
-        headers = ['Date', 'Document Name', 'Status', 'Analysis Type', 'Risk Level', 'Recommendation']
-        ws.append(headers)
-        
-        # Data rows
-        for record in history:
-            row = [
-                record.get('created_at', ''),
-                record.get('filename', ''),
-                record.get('status', ''),
-                record.get('analysis_type', ''),
-                record.get('risk_level', ''),
-                record.get('recommendation', '')
-            ]
-            ws.append(row)
+        import pandas as pd
         
-        self._style_excel_sheet(ws, "Analysis History")
-        wb.save(str(filepath))
+        frame = self._history_frame(history)
+        
+        with pd.ExcelWriter(
+            filepath,
+            engine="xlsxwriter",
+            datetime_format="yyyy-mm-dd hh:mm:ss",
+            engine_kwargs={"options": {"strings_to_numbers": False}}
+        ) as writer:
+            frame.to_excel(writer, sheet_name="Analysis History", index=False)
+            
+            # Size columns from the longest rendered value, computed per column in pandas
+            sheet = writer.sheets["Analysis History"]
+            for column_index, column in enumerate(frame.columns):
+                longest_value = frame[column].astype(str).str.len().max() if len(frame) else 0
+                sheet.set_column(column_index, column_index, min(max(len(column), longest_value) + 2, 50))
         
         return str(filepath)
     
     def _export_history_to_csv(self, history: List[Dict], filepath: Path, user_id: str) -> str:
         """Export user history to CSV"""
         with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['Date', 'Document Name', 'Status', 'Analysis Type', 'Risk Level', 'Recommendation']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer = csv.DictWriter(csvfile, fieldnames=list(HISTORY_EXPORT_COLUMNS.values()))
             
+            # CSV needs no dtype inference, so rows are written straight from the records
             writer.writeheader()
-            for record in history:
-                writer.writerow({
-                    'Date': record.get('created_at', ''),
-                    'Document Name': record.get('filename', ''),
-                    'Status': record.get('status', ''),
-                    'Analysis Type': record.get('analysis_type', ''),
-                    'Risk Level': record.get('risk_level', ''),
-                    'Recommendation': record.get('recommendation', '')
-                })
+            writer.writerows(
+                {header: record.get(field, '') for field, header in HISTORY_EXPORT_COLUMNS.items()}
+                for record in history
+            )
         
         return str(filepath)
     
-    def _export_analysis_to_json(self, analysis_data: Dict[str, Any], user_id: str) -> str:
-        """Export analysis to JSON format"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"analysis_report_{timestamp}.json"
-        filepath = self.export_dir / filename
-        
+    def _build_analysis_json(self, analysis_data: Dict[str, Any], user_id: str) -> bytes:
+        """Serialize an analysis export document to JSON bytes"""
         export_data = {
             'export_info': {
                 'generated_at': datetime.now().isoformat(),
@@ -617,21 +869,37 @@ For questions or support, please contact the system administrator.
             'analysis_data': analysis_data
         }
         
-        with open(filepath, 'w', encoding='utf-8') as jsonfile:
-            json.dump(export_data, jsonfile, indent=2, default=str)
+        return _dumps_json(export_data)
+    
+    def _export_analysis_to_json(self, analysis_data: Dict[str, Any], user_id: str) -> str:
+        """Export analysis to JSON format"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"analysis_report_{timestamp}.json"
+        filepath = self.export_dir / filename
+        
+        filepath.write_bytes(self._build_analysis_json(analysis_data, user_id))
         
         return str(filepath)
     
     def cleanup_old_exports(self, days: int = 7):
         """Clean up export files older than specified days"""
         try:
-            cutoff_date = datetime.now().timestamp() - (days * 24 * 60 * 60)
-            cleaned_count = 0
+            cutoff_date = time.time() - (days * 24 * 60 * 60)
+            
+            # DirEntry caches stat results, so each entry costs at most one stat call;
+            # collect first so the directory isn't mutated while it is being scanned
+            with os.scandir(self.export_dir) as entries:
+                stale_paths = [
+                    entry.path for entry in entries
+                    if entry.is_file(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mtime < cutoff_date
+                ]
             
-            for file_path in self.export_dir.iterdir():
-                if file_path.is_file() and file_path.stat().st_mtime < cutoff_date:
-                    file_path.unlink()
-                    cleaned_count += 1
+            # unlink releases the GIL, so large batches are spread across a pool
+            if len(stale_paths) < PARALLEL_UNLINK_THRESHOLD:
+                cleaned_count = sum(map(_unlink_quietly, stale_paths))
+            else:
+                with ThreadPoolExecutor(max_workers=8) as executor:
+                    cleaned_count = sum(executor.map(_unlink_quietly, stale_paths))
             
             logger.info(f"Cleaned up {cleaned_count} old export files")
             return cleaned_count
@@ -642,10 +910,14 @@ For questions or support, please contact the system administrator.
 
 # Global export service instance
 export_service = None
+_export_service_lock = threading.Lock()
 
 def get_export_service() -> ExportService:
     """Get or create export service instance"""
     global export_service
     if export_service is None:
-        export_service = ExportService()
+        with _export_service_lock:
+            # Re-check under the lock so concurrent first calls build a single instance
+            if export_service is None:
+                export_service = ExportService()
     return export_service
@@ -4,36 +4,76 @@ Implements 2FA, advanced input validation, and security monitoring
 """
 
 import os
+import base64
+import copy
 import hashlib
+import importlib.util
 import secrets
 import time
 import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime, timedelta
+from io import BytesIO
 import logging
 import asyncio
 from pathlib import Path
 
+from pymongo import IndexModel
+from pymongo.errors import BulkWriteError
+
 # 2FA dependencies
 try:
     import pyotp
-    import qrcode
-    from io import BytesIO
-    import base64
     PYOTP_AVAILABLE = True
-    QRCODE_AVAILABLE = True
 except ImportError:
     PYOTP_AVAILABLE = False
+    logging.warning("pyotp not available. 2FA will be limited.")
+
+try:
+    import segno
+    QRCODE_AVAILABLE = True
+except ImportError:
     QRCODE_AVAILABLE = False
-    logging.warning("pyotp/qrcode not available. 2FA will be limited.")
+    logging.warning("segno not available. 2FA setup will not include a QR code.")
 
-# Security monitoring dependencies
+# File type detection dependencies
 try:
-    import bcrypt
-    BCRYPT_AVAILABLE = True
+    import magic
+    MAGIC_AVAILABLE = True
 except ImportError:
-    BCRYPT_AVAILABLE = False
-    logging.warning("bcrypt not available. Password hashing will be limited.")
+    MAGIC_AVAILABLE = False
+    logging.warning("python-magic not available. File type detection will be limited.")
+
+# Email parsing dependencies
+try:
+    from email_validator import validate_email, EmailNotValidError
+    EMAIL_VALIDATOR_AVAILABLE = True
+except ImportError:
+    EMAIL_VALIDATOR_AVAILABLE = False
+    logging.warning("email-validator not available. Email validation will use a basic pattern.")
+
+# Password hashing dependencies; bcrypt is a hard requirement, argon2id is preferred when installed
+from passlib.context import CryptContext
+
+ARGON2_AVAILABLE = importlib.util.find_spec("argon2") is not None
+if not ARGON2_AVAILABLE:
+    logging.warning("argon2-cffi not available. Password hashing will use bcrypt.")
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# New hashes use the first scheme; hashes from the other schemes still verify
+password_context = CryptContext(
+    schemes=["argon2", "bcrypt"] if ARGON2_AVAILABLE else ["bcrypt"],
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__time_cost=2,
+    argon2__memory_cost=65536,
+    argon2__parallelism=1,
+    bcrypt__rounds=BCRYPT_ROUNDS
+)
 
 from app.core.database import get_mongodb_client
 from app.models.schemas import LogLevel, LogCategory, LogAction
@@ -41,6 +81,193 @@ from app.models.schemas import LogLevel, LogCategory, LogAction
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Validation patterns, compiled once at import
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_EMAIL_SUSPICIOUS_RE = re.compile(
+    r'\.{2,}'   # Multiple consecutive dots
+    r'|@.*@'    # Multiple @ symbols
+    r'|[<>"\']'  # HTML/script injection attempts
+)
+# Well-known disposable email domains, extended from DISPOSABLE_DOMAINS_FILE (one per line) if set
+_DEFAULT_DISPOSABLE_DOMAINS = (
+    'mailinator.com', 'guerrillamail.com', 'guerrillamail.net', 'sharklasers.com',
+    '10minutemail.com', 'tempmail.com', 'temp-mail.org', 'throwawaymail.com',
+    'yopmail.com', 'trashmail.com', 'getnada.com', 'dispostable.com',
+    'maildrop.cc', 'fakeinbox.com', 'mintemail.com', 'mohmal.com'
+)
+
+
+def _load_disposable_domains() -> frozenset:
+    """Build the disposable-domain set once at import"""
+    domains = set(_DEFAULT_DISPOSABLE_DOMAINS)
+    domains_file = os.getenv("DISPOSABLE_DOMAINS_FILE")
+    if domains_file:
+        try:
+            with open(domains_file, encoding='utf-8') as f:
+                domains.update(line.strip().lower() for line in f if line.strip() and not line.startswith('#'))
+        except OSError as e:
+            logging.warning(f"Could not load disposable email domains from {domains_file}: {e}")
+    return frozenset(domains)
+
+
+_DISPOSABLE_DOMAINS = _load_disposable_domains()
+_PWD_LOWER = re.compile(r'[a-z]')
+_PWD_UPPER = re.compile(r'[A-Z]')
+_PWD_DIGIT = re.compile(r'\d')
+_PWD_SPECIAL = re.compile(r'[!@#$%^&*(),.?":{}|<>]')
+_PWD_REPEAT = re.compile(r'(.)\1{2,}')
+# All four character classes at once; the individual patterns only run to explain a miss
+_PWD_ALL_CLASSES = re.compile(r'(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[!@#$%^&*(),.?":{}|<>])', re.DOTALL)
+# Common weak passwords, compared case-insensitively
+_WEAK_PASSWORDS = frozenset({
+    'password', '123456', 'password123', 'admin', 'qwerty',
+    'letmein', 'welcome', 'monkey', 'dragon', 'master'
+})
+# Path separators (which also rules out ../ traversal) and shell/HTML metacharacters
+_FORBIDDEN_FILENAME_CHARS = frozenset('/\\<>"\'&|;`$*?[]{}()')
+# Reserved device names on Windows
+_RESERVED_NAMES = frozenset({
+    'CON', 'PRN', 'AUX', 'NUL',
+    'COM1', 'COM2', 'COM3', 'COM4', 'COM5', 'COM6', 'COM7', 'COM8', 'COM9',
+    'LPT1', 'LPT2', 'LPT3', 'LPT4', 'LPT5', 'LPT6', 'LPT7', 'LPT8', 'LPT9'
+})
+_SCRIPT_RE = re.compile(
+    r'<script[^>]*>.*?</script>|javascript:|vbscript:|on(load|error|click)\s*=',
+    re.IGNORECASE
+)
+# Every script pattern needs one of these, so text without them skips the regex
+_SCRIPT_TRIGGER_CHARS = frozenset('<:=')
+_TEXT_STRIP_RE = re.compile(r'[<>"\']')
+# MIME types flagged on upload
+_SUSPICIOUS_MIME_TYPES = frozenset({
+    'application/x-executable',
+    'application/x-msdownload',
+    'application/x-msdos-program',
+    'application/x-sh',
+    'text/x-php',
+    'application/x-php',
+})
+# Script indicators in raw (lower-cased) file bytes
+_SCRIPT_BYTES_RE = re.compile(rb'<script|javascript:|vbscript:|eval\(|exec\(')
+
+# Security recommendation messages
+_RECOMMEND_LOCKOUT = "High number of failed login attempts detected - consider implementing account lockout"
+_RECOMMEND_REVIEW_ACCESS = "Multiple suspicious activities detected - review user access patterns"
+_RECOMMEND_RATE_LIMIT = "Consider implementing rate limiting for login attempts"
+_RECOMMEND_NONE = "Security status appears normal"
+
+
+class LoginAttemptBatcher:
+    """Per-process buffer that writes login attempts in batches off the request path"""
+    
+    def __init__(self, collection, max_batch: int = 100, flush_interval: float = 0.25):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_failures: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+    
+    def queue(self, attempt: Dict[str, Any]) -> None:
+        """Buffer an attempt, flushing once the batch is full or on a short background timer"""
+        with self._lock:
+            self._pending.append(attempt)
+            if not attempt['success']:
+                user_id = attempt['user_id']
+                self._pending_failures[user_id] = self._pending_failures.get(user_id, 0) + 1
+            
+            full = len(self._pending) >= self.max_batch
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        
+        if full:
+            self.flush()
+    
+    def pending_failures(self, user_id: str) -> int:
+        """Failed attempts for a user that are buffered but not yet written"""
+        with self._lock:
+            return self._pending_failures.get(user_id, 0)
+    
+    def flush(self) -> int:
+        """Write all buffered attempts; returns the number written"""
+        written = 0
+        with self._lock:
+            batch = self._pending
+            self._pending = []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        
+        if not batch:
+            return 0
+        
+        try:
+            self.collection.insert_many(batch, ordered=False)
+            written = len(batch)
+        except BulkWriteError as e:
+            # Unordered inserts keep going past a failed document
+            written = e.details.get('nInserted', 0)
+            logger.error(f"Error writing login attempts, dropped {len(batch) - written} of {len(batch)}: {e}")
+        except Exception as e:
+            logger.error(f"Error writing login attempts, dropped {len(batch)}: {e}")
+        finally:
+            # Failures stay counted until their documents are visible to lockout queries
+            with self._lock:
+                for attempt in batch:
+                    if not attempt['success']:
+                        user_id = attempt['user_id']
+                        remaining = self._pending_failures.get(user_id, 0) - 1
+                        if remaining > 0:
+                            self._pending_failures[user_id] = remaining
+                        else:
+                            self._pending_failures.pop(user_id, None)
+        
+        return written
+
+
+class _TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a fixed TTL"""
+    
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        # key -> (value, expiry on the monotonic clock), least recently used first
+        self._entries: "OrderedDict[Any, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Any) -> Any:
+        """Return the cached value, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+    
+    def set(self, key: Any, value: Any) -> None:
+        """Cache a value, evicting expired entries and then the least recently used when full"""
+        now = time.monotonic()
+        with self._lock:
+            self._entries.pop(key, None)
+            if len(self._entries) >= self.max_size:
+                for stale in [k for k, entry in self._entries.items() if entry[1] <= now]:
+                    del self._entries[stale]
+                while len(self._entries) >= self.max_size:
+                    self._entries.popitem(last=False)
+            self._entries[key] = (value, now + self.ttl)
+    
+    def pop(self, key: Any) -> None:
+        """Drop a cached value"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+
 class SecurityService:
     """Advanced security service with 2FA and input validation"""
     
@@ -50,6 +277,12 @@ class SecurityService:
         self.lockout_duration = 15 * 60  # 15 minutes
         self.session_timeout = 24 * 60 * 60  # 24 hours
         
+        # Active TOTP verifiers by user_id
+        self._totp_cache = _TTLCache(ttl=60, max_size=1024)
+        
+        # Security summaries by (user_id, days)
+        self._summary_cache = _TTLCache(ttl=30, max_size=1024)
+        
         # Initialize logging service
         from app.core.logging import get_logging_service
         self.logging_service = get_logging_service()
@@ -58,43 +291,60 @@ class SecurityService:
         self._initialize_security_collections()
     
     def _initialize_security_collections(self):
-        """Initialize MongoDB collections for security"""
+        """Initialize MongoDB collections for security; indexes are created at application startup"""
         try:
-            if self.mongodb_client.db:
+            if self.mongodb_client.db is not None:
                 self.security_events_collection = self.mongodb_client.db['security_events']
                 self.twofa_secrets_collection = self.mongodb_client.db['twofa_secrets']
                 self.login_attempts_collection = self.mongodb_client.db['login_attempts']
                 self.suspicious_activities_collection = self.mongodb_client.db['suspicious_activities']
+                self.login_attempt_batcher = LoginAttemptBatcher(self.login_attempts_collection)
                 
-                # Create indexes
-                self._create_security_indexes()
                 logger.info("Security collections initialized")
         except Exception as e:
             logger.error(f"Failed to initialize security collections: {e}")
     
-    def _create_security_indexes(self):
-        """Create indexes for security collections"""
+    def create_indexes(self):
+        """Create indexes for security collections, one createIndexes command per collection"""
         try:
             # Security events indexes
-            self.security_events_collection.create_index("timestamp")
-            self.security_events_collection.create_index("user_id")
-            self.security_events_collection.create_index("event_type")
-            self.security_events_collection.create_index([("timestamp", -1), ("user_id", 1)])
+            self.security_events_collection.create_indexes([
+                IndexModel("user_id"),
+                IndexModel("event_type"),
+                IndexModel([("timestamp", -1), ("user_id", 1)])
+            ])
             
             # 2FA secrets indexes
-            self.twofa_secrets_collection.create_index("user_id", unique=True)
-            self.twofa_secrets_collection.create_index("created_at")
-            
-            # Login attempts indexes
-            self.login_attempts_collection.create_index("user_id")
-            self.login_attempts_collection.create_index("ip_address")
-            self.login_attempts_collection.create_index("timestamp")
-            self.login_attempts_collection.create_index([("user_id", 1), ("timestamp", -1)])
+            self.twofa_secrets_collection.create_indexes([
+                IndexModel("user_id", unique=True),
+                IndexModel("created_at")
+            ])
+            
+            # Login attempts indexes (equality, then equality, then range for lockout checks)
+            self.login_attempts_collection.create_indexes([
+                IndexModel("ip_address"),
+                IndexModel("timestamp"),
+                IndexModel([("user_id", 1), ("timestamp", -1)]),
+                IndexModel([("user_id", 1), ("success", 1), ("timestamp", -1)])
+            ])
             
             # Suspicious activities indexes
-            self.suspicious_activities_collection.create_index("timestamp")
-            self.suspicious_activities_collection.create_index("user_id")
-            self.suspicious_activities_collection.create_index("activity_type")
+            self.suspicious_activities_collection.create_indexes([
+                IndexModel("timestamp"),
+                IndexModel("activity_type"),
+                IndexModel([("user_id", 1), ("timestamp", -1)])
+            ])
+            
+            # Single-field indexes covered by a compound index's prefix; the timestamp indexes on
+            # login attempts and suspicious activities stay for all-user summary range queries
+            redundant_indexes = (
+                (self.security_events_collection, "timestamp_1"),
+                (self.login_attempts_collection, "user_id_1"),
+                (self.suspicious_activities_collection, "user_id_1"),
+            )
+            for collection, index_name in redundant_indexes:
+                if index_name in collection.index_information():
+                    collection.drop_index(index_name)
             
             logger.info("Security indexes created")
         except Exception as e:
@@ -138,26 +388,31 @@ class SecurityService:
             result['errors'].append("Email is required")
             return result
         
-        # Basic email regex
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if not re.match(email_pattern, email):
-            result['is_valid'] = False
-            result['errors'].append("Invalid email format")
-            return result
+        if EMAIL_VALIDATOR_AVAILABLE:
+            # Linear-time parser; deliverability (DNS) is not checked on this path
+            try:
+                normalized = validate_email(email, check_deliverability=False).normalized
+            except EmailNotValidError:
+                result['is_valid'] = False
+                result['errors'].append("Invalid email format")
+                return result
+        else:
+            # Basic email regex
+            if not _EMAIL_RE.match(email):
+                result['is_valid'] = False
+                result['errors'].append("Invalid email format")
+                return result
+            normalized = email
         
         # Check for suspicious patterns
-        suspicious_patterns = [
-            r'\.{2,}',  # Multiple consecutive dots
-            r'@.*@',    # Multiple @ symbols
-            r'[<>"\']', # HTML/script injection attempts
-        ]
-        
-        for pattern in suspicious_patterns:
-            if re.search(pattern, email):
-                result['warnings'].append("Email contains suspicious characters")
-                break
-        
-        result['sanitized_data'] = email.lower().strip()
+        if _EMAIL_SUSPICIOUS_RE.search(email):
+            result['warnings'].append("Email contains suspicious characters")
+        
+        # Check the domain against the disposable-domain set with a single hash lookup
+        if normalized.rpartition('@')[2].lower() in _DISPOSABLE_DOMAINS:
+            result['warnings'].append("Email uses a disposable email domain")
+        
+        result['sanitized_data'] = normalized.lower().strip()
         return result
     
     def _validate_password(self, password: str, result: Dict[str, Any]) -> Dict[str, Any]:
@@ -173,33 +428,31 @@ class SecurityService:
             result['errors'].append("Password must be at least 8 characters long")
         
         if len(password) > 128:
+            # Rejected outright; don't run the pattern checks over oversized input
             result['is_valid'] = False
             result['errors'].append("Password must be less than 128 characters")
+            return result
         
         # Check for required character types
-        if not re.search(r'[a-z]', password):
-            result['errors'].append("Password must contain at least one lowercase letter")
-        
-        if not re.search(r'[A-Z]', password):
-            result['errors'].append("Password must contain at least one uppercase letter")
-        
-        if not re.search(r'\d', password):
-            result['errors'].append("Password must contain at least one digit")
-        
-        if not re.search(r'[!@#$%^&*(),.?":{}|<>]', password):
-            result['errors'].append("Password must contain at least one special character")
+        if not _PWD_ALL_CLASSES.match(password):
+            if not _PWD_LOWER.search(password):
+                result['errors'].append("Password must contain at least one lowercase letter")
+            
+            if not _PWD_UPPER.search(password):
+                result['errors'].append("Password must contain at least one uppercase letter")
+            
+            if not _PWD_DIGIT.search(password):
+                result['errors'].append("Password must contain at least one digit")
+            
+            if not _PWD_SPECIAL.search(password):
+                result['errors'].append("Password must contain at least one special character")
         
         # Check for common weak passwords
-        weak_passwords = [
-            'password', '123456', 'password123', 'admin', 'qwerty',
-            'letmein', 'welcome', 'monkey', 'dragon', 'master'
-        ]
-        
-        if password.lower() in weak_passwords:
+        if password.lower() in _WEAK_PASSWORDS:
             result['warnings'].append("Password is commonly used and easily guessable")
         
         # Check for repeated characters
-        if re.search(r'(.)\1{2,}', password):
+        if _PWD_REPEAT.search(password):
             result['warnings'].append("Password contains repeated characters")
         
         if result['errors']:
@@ -214,36 +467,11 @@ class SecurityService:
             result['errors'].append("Filename is required")
             return result
         
-        # Check for path traversal attempts
-        dangerous_patterns = [
-            r'\.\./',  # Directory traversal
-            r'\.\.\\', # Windows directory traversal
-            r'/',      # Path separators
-            r'\\',     # Windows path separators
-            r'<',      # HTML/script injection
-            r'>',
-            r'"',
-            r"'",
-            r'&',
-            r'|',
-            r';',
-            r'`',
-            r'$',
-            r'*',
-            r'?',
-            r'[',
-            r']',
-            r'{',
-            r'}',
-            r'(',
-            r')',
-        ]
-        
-        for pattern in dangerous_patterns:
-            if re.search(pattern, filename):
-                result['is_valid'] = False
-                result['errors'].append(f"Filename contains dangerous characters: {pattern}")
-                break
+        # Check for path traversal attempts and other dangerous characters in one pass
+        dangerous_chars = _FORBIDDEN_FILENAME_CHARS.intersection(filename)
+        if dangerous_chars:
+            result['is_valid'] = False
+            result['errors'].append(f"Filename contains dangerous characters: {''.join(sorted(dangerous_chars))}")
         
         # Check filename length
         if len(filename) > 255:
@@ -251,8 +479,7 @@ class SecurityService:
             result['errors'].append("Filename too long")
         
         # Check for reserved names (Windows)
-        reserved_names = ['CON', 'PRN', 'AUX', 'NUL', 'COM1', 'COM2', 'COM3', 'COM4', 'COM5', 'COM6', 'COM7', 'COM8', 'COM9', 'LPT1', 'LPT2', 'LPT3', 'LPT4', 'LPT5', 'LPT6', 'LPT7', 'LPT8', 'LPT9']
-        if filename.upper().split('.')[0] in reserved_names:
+        if filename.partition('.')[0].upper() in _RESERVED_NAMES:
             result['is_valid'] = False
             result['errors'].append("Filename is reserved")
         
@@ -273,23 +500,12 @@ class SecurityService:
             result['errors'].append(f"Text too long (max: {max_length} characters)")
         
         # Check for script injection attempts
-        script_patterns = [
-            r'<script[^>]*>.*?</script>',
-            r'javascript:',
-            r'vbscript:',
-            r'onload\s*=',
-            r'onerror\s*=',
-            r'onclick\s*=',
-        ]
-        
-        for pattern in script_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                result['warnings'].append("Text contains potential script injection")
-                break
+        if not _SCRIPT_TRIGGER_CHARS.isdisjoint(text) and _SCRIPT_RE.search(text):
+            result['warnings'].append("Text contains potential script injection")
         
         if result['is_valid']:
             # Basic sanitization
-            sanitized = re.sub(r'[<>"\']', '', text)
+            sanitized = _TEXT_STRIP_RE.sub('', text)
             result['sanitized_data'] = sanitized.strip()
         
         return result
@@ -313,35 +529,24 @@ class SecurityService:
             result['errors'].append("File is empty")
             return result
         
-        # Detect file type using magic numbers
+        # Detect file type using magic numbers; the header is enough to sniff the type
         try:
-            # Note: This would require python-magic to be installed
-            # For now, we'll skip this check if magic is not available
-            result['detected_mime_type'] = 'unknown'
+            if MAGIC_AVAILABLE:
+                # from_buffer reuses one shared libmagic handle per mime flag, behind a lock, so the database loads once per process
+                mime_type = magic.from_buffer(file_content[:4096], mime=True)
+            else:
+                mime_type = 'unknown'
+            result['detected_mime_type'] = mime_type
             
             # Check for suspicious file types
-            suspicious_types = [
-                'application/x-executable',
-                'application/x-msdownload',
-                'application/x-msdos-program',
-                'application/x-sh',
-                'text/x-php',
-                'application/x-php',
-            ]
-            
-            if mime_type in suspicious_types:
+            if mime_type in _SUSPICIOUS_MIME_TYPES:
                 result['warnings'].append(f"Suspicious file type detected: {mime_type}")
         except Exception as e:
             result['warnings'].append(f"Could not detect file type: {str(e)}")
         
-        # Check for embedded scripts in file content
-        content_str = file_content[:1000].decode('utf-8', errors='ignore').lower()
-        script_indicators = ['<script', 'javascript:', 'vbscript:', 'eval(', 'exec(']
-        
-        for indicator in script_indicators:
-            if indicator in content_str:
-                result['warnings'].append("File content contains potential script indicators")
-                break
+        # Check for embedded scripts in file content; the indicators are ASCII, so scan the bytes directly
+        if _SCRIPT_BYTES_RE.search(file_content[:1000].lower()):
+            result['warnings'].append("File content contains potential script indicators")
         
         return result
     
@@ -369,16 +574,13 @@ class SecurityService:
             # Generate QR code
             qr_code_data = None
             if QRCODE_AVAILABLE:
-                qr = qrcode.QRCode(version=1, box_size=10, border=5)
-                qr.add_data(provisioning_uri)
-                qr.make(fit=True)
-                
-                img = qr.make_image(fill_color="black", back_color="white")
+                qr = segno.make(provisioning_uri, error='m')
                 buffer = BytesIO()
-                img.save(buffer, format='PNG')
+                qr.save(buffer, kind='png', scale=10, border=5)
                 qr_code_data = base64.b64encode(buffer.getvalue()).decode()
             
             # Store secret in database
+            self._forget_totp(user_id)
             self.twofa_secrets_collection.insert_one({
                 'user_id': user_id,
                 'secret': secret,
@@ -418,20 +620,15 @@ class SecurityService:
                     'error': '2FA not available - pyotp not installed'
                 }
             
-            # Get user's 2FA secret
-            twofa_record = self.twofa_secrets_collection.find_one({
-                'user_id': user_id,
-                'is_active': True
-            })
-            
-            if not twofa_record:
+            # Get user's 2FA verifier
+            totp = self._get_cached_totp(user_id)
+            if totp is None:
                 return {
                     'success': False,
                     'error': '2FA not set up for this user'
                 }
             
             # Verify token
-            totp = pyotp.TOTP(twofa_record['secret'])
             is_valid = totp.verify(token, valid_window=1)  # Allow 1 time step tolerance
             
             if is_valid:
@@ -470,9 +667,33 @@ class SecurityService:
                 'error': str(e)
             }
     
+    def _get_cached_totp(self, user_id: str) -> Optional["pyotp.TOTP"]:
+        """Return the user's TOTP verifier, loading the active secret at most once per TTL"""
+        totp = self._totp_cache.get(user_id)
+        if totp is not None:
+            return totp
+        
+        twofa_record = self.twofa_secrets_collection.find_one(
+            {'user_id': user_id, 'is_active': True},
+            {'secret': 1}
+        )
+        if not twofa_record:
+            self._forget_totp(user_id)
+            return None
+        
+        totp = pyotp.TOTP(twofa_record['secret'])
+        self._totp_cache.set(user_id, totp)
+        return totp
+    
+    def _forget_totp(self, user_id: str) -> None:
+        """Drop the user's cached TOTP verifier after their 2FA secret changes"""
+        self._totp_cache.pop(user_id)
+    
     def disable_2fa(self, user_id: str) -> Dict[str, Any]:
         """Disable 2FA for a user"""
         try:
+            self._forget_totp(user_id)
+            
             # Deactivate 2FA secret
             result = self.twofa_secrets_collection.update_one(
                 {'user_id': user_id, 'is_active': True},
@@ -509,24 +730,24 @@ class SecurityService:
     def check_login_attempts(self, user_id: str, ip_address: str) -> Dict[str, Any]:
         """Check if user is locked out due to failed login attempts"""
         try:
-            # Check recent failed attempts
-            recent_attempts = list(self.login_attempts_collection.find({
+            # Count recent failed attempts, including ones still waiting to be written
+            recent_attempts = self.login_attempts_collection.count_documents({
                 'user_id': user_id,
                 'timestamp': {'$gte': datetime.utcnow() - timedelta(minutes=15)},
                 'success': False
-            }))
+            }) + self.login_attempt_batcher.pending_failures(user_id)
             
-            if len(recent_attempts) >= self.max_login_attempts:
+            if recent_attempts >= self.max_login_attempts:
                 return {
                     'is_locked': True,
                     'lockout_remaining': self.lockout_duration,
-                    'attempts': len(recent_attempts)
+                    'attempts': recent_attempts
                 }
             
             return {
                 'is_locked': False,
-                'attempts': len(recent_attempts),
-                'remaining_attempts': self.max_login_attempts - len(recent_attempts)
+                'attempts': recent_attempts,
+                'remaining_attempts': self.max_login_attempts - recent_attempts
             }
             
         except Exception as e:
@@ -539,7 +760,7 @@ class SecurityService:
     def record_login_attempt(self, user_id: str, ip_address: str, success: bool, user_agent: str = None):
         """Record login attempt"""
         try:
-            self.login_attempts_collection.insert_one({
+            self.login_attempt_batcher.queue({
                 'user_id': user_id,
                 'ip_address': ip_address,
                 'success': success,
@@ -568,16 +789,17 @@ class SecurityService:
     def detect_suspicious_activity(self, user_id: str, activity_type: str, details: Dict[str, Any]) -> bool:
         """Detect suspicious user activity"""
         try:
+            now = datetime.utcnow()
             suspicious = False
             risk_score = 0
             
             # Check for rapid successive actions
-            recent_activities = list(self.suspicious_activities_collection.find({
+            recent_activities = self.suspicious_activities_collection.count_documents({
                 'user_id': user_id,
-                'timestamp': {'$gte': datetime.utcnow() - timedelta(minutes=5)}
-            }))
+                'timestamp': {'$gte': now - timedelta(minutes=5)}
+            })
             
-            if len(recent_activities) > 10:
+            if recent_activities > 10:
                 suspicious = True
                 risk_score += 50
             
@@ -604,7 +826,7 @@ class SecurityService:
                     'activity_type': activity_type,
                     'risk_score': risk_score,
                     'details': details,
-                    'timestamp': datetime.utcnow(),
+                    'timestamp': now,
                     'flagged': True
                 })
                 
@@ -629,7 +851,13 @@ class SecurityService:
             return False
     
     def get_security_summary(self, user_id: str = None, days: int = 7) -> Dict[str, Any]:
-        """Get security summary for monitoring"""
+        """Get security summary for monitoring, reusing a recent result for repeated polls"""
+        cache_key = (user_id or '_all_', days)
+        cached = self._summary_cache.get(cache_key)
+        if cached is not None:
+            # Callers get their own copy so they cannot alter the cached summary
+            return copy.deepcopy(cached)
+        
         try:
             end_date = datetime.utcnow()
             start_date = end_date - timedelta(days=days)
@@ -638,55 +866,88 @@ class SecurityService:
             if user_id:
                 query['user_id'] = user_id
             
-            # Get security events
-            security_events = list(self.security_events_collection.find(query))
-            
-            # Get login attempts
-            login_attempts = list(self.login_attempts_collection.find(query))
+            # Make buffered login attempts visible to the aggregation
+            self.login_attempt_batcher.flush()
             
-            # Get suspicious activities
-            suspicious_activities = list(self.suspicious_activities_collection.find(query))
+            # The three collections are independent, so query them concurrently
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                events_future = executor.submit(self._count_security_events, query)
+                logins_future = executor.submit(self._count_login_outcomes, query)
+                activities_future = executor.submit(self._summarize_suspicious_activities, query)
+                
+                total_security_events = events_future.result()
+                login_counts = logins_future.result()
+                activity_stats = activities_future.result()
             
             # Calculate statistics
-            failed_logins = len([a for a in login_attempts if not a['success']])
-            successful_logins = len([a for a in login_attempts if a['success']])
-            flagged_activities = len([a for a in suspicious_activities if a.get('flagged', False)])
+            failed_logins = login_counts.get(False, 0)
+            successful_logins = login_counts.get(True, 0)
+            flagged_activities = activity_stats['flagged']
             
-            return {
+            summary = {
                 'period_days': days,
-                'total_security_events': len(security_events),
+                'total_security_events': total_security_events,
                 'login_attempts': {
                     'successful': successful_logins,
                     'failed': failed_logins,
                     'success_rate': (successful_logins / (successful_logins + failed_logins) * 100) if (successful_logins + failed_logins) > 0 else 0
                 },
                 'suspicious_activities': {
-                    'total': len(suspicious_activities),
+                    'total': activity_stats['total'],
                     'flagged': flagged_activities,
-                    'risk_score_avg': sum(a.get('risk_score', 0) for a in suspicious_activities) / len(suspicious_activities) if suspicious_activities else 0
+                    'risk_score_avg': activity_stats['risk_score_avg']
                 },
                 'security_recommendations': self._generate_security_recommendations(failed_logins, flagged_activities)
             }
             
+            self._summary_cache.set(cache_key, copy.deepcopy(summary))
+            return summary
+            
         except Exception as e:
             logger.error(f"Error getting security summary: {e}")
             return {'error': str(e)}
     
+    def _count_security_events(self, query: Dict[str, Any]) -> int:
+        """Count security events matching the summary query"""
+        return self.security_events_collection.count_documents(query)
+    
+    def _count_login_outcomes(self, query: Dict[str, Any]) -> Dict[bool, int]:
+        """Count login attempts per outcome on the server"""
+        return {
+            group['_id']: group['count']
+            for group in self.login_attempts_collection.aggregate([
+                {'$match': query},
+                {'$group': {'_id': '$success', 'count': {'$sum': 1}}}
+            ])
+        }
+    
+    def _summarize_suspicious_activities(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        """Reduce suspicious activities to totals on the server"""
+        return next(self.suspicious_activities_collection.aggregate([
+            {'$match': query},
+            {'$group': {
+                '_id': None,
+                'total': {'$sum': 1},
+                'flagged': {'$sum': {'$cond': ['$flagged', 1, 0]}},
+                'risk_score_avg': {'$avg': {'$ifNull': ['$risk_score', 0]}}
+            }}
+        ]), {'total': 0, 'flagged': 0, 'risk_score_avg': 0})
+    
     def _generate_security_recommendations(self, failed_logins: int, flagged_activities: int) -> List[str]:
         """Generate security recommendations based on activity"""
         recommendations = []
         
         if failed_logins > 10:
-            recommendations.append("High number of failed login attempts detected - consider implementing account lockout")
+            recommendations.append(_RECOMMEND_LOCKOUT)
         
         if flagged_activities > 5:
-            recommendations.append("Multiple suspicious activities detected - review user access patterns")
+            recommendations.append(_RECOMMEND_REVIEW_ACCESS)
         
         if failed_logins > 5:
-            recommendations.append("Consider implementing rate limiting for login attempts")
+            recommendations.append(_RECOMMEND_RATE_LIMIT)
         
         if not recommendations:
-            recommendations.append("Security status appears normal")
+            recommendations.append(_RECOMMEND_NONE)
         
         return recommendations
 
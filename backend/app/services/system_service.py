@@ -3,35 +3,242 @@ System Service
 Handles system health and monitoring operations
 """
 
+import asyncio
 import logging
-from app.repositories.connection import get_sync_database
+import threading
+import time
+from concurrent.futures import Future
+from types import MappingProxyType
+from typing import Mapping, Optional
+import pymongo
+from bson.son import SON
+from app.repositories.connection import get_healthcheck_database
 
 logger = logging.getLogger(__name__)
 
+# Last healthy result, reused by probes within the TTL and reported as degraded
+# within the grace period if a later check fails
+_HEALTH_CACHE = {"ts": 0.0, "value": None, "last_good_ts": 0.0, "last_good": None, "stats": None}
+_HEALTH_CACHE_TTL = 5.0  # seconds
+_HEALTH_GRACE_PERIOD = 30.0  # seconds
+
+_HEALTHY_TEMPLATE = {"status": "healthy", "database": "connected"}
+
+# Read-only healthy response shared by every non-verbose probe; FastAPI's encoder
+# serializes any mapping, so it can be returned as-is without copying
+_HEALTHY_RESPONSE = MappingProxyType(_HEALTHY_TEMPLATE)
+
+# Single-flight guard: concurrent cache misses share one in-flight check
+_HEALTH_FLIGHT_LOCK = threading.Lock()
+_HEALTH_INFLIGHT = {"future": None}
+
+# Overall budget for the database checks, covering server selection, network and server execution
+_HEALTH_TIMEOUT = 0.75  # seconds
+
+# dbStats walks every collection, so it is refreshed in the background instead of per probe
+_STATS_REFRESH_INTERVAL = 60.0  # seconds
+_STATS_TIMEOUT = 5.0  # seconds
+_DB_STATS_COMMAND = SON([("dbStats", 1), ("scale", 1)])
+_stats_refresher: Optional[threading.Thread] = None
+_stats_refresher_lock = threading.Lock()
+
+
+def _database_stats(stats: dict) -> Mapping:
+    """Pick the reported fields out of a dbStats reply, which always carries them"""
+    try:
+        fields = {
+            "collections": stats["collections"],
+            "data_size": stats["dataSize"],
+            "storage_size": stats["storageSize"]
+        }
+    except KeyError:
+        fields = {
+            "collections": stats.get("collections", 0),
+            "data_size": stats.get("dataSize", 0),
+            "storage_size": stats.get("storageSize", 0)
+        }
+    return MappingProxyType(fields)
+
+
+def _refresh_database_stats() -> Mapping:
+    """Run dbStats and store the result in the health cache"""
+    with pymongo.timeout(_STATS_TIMEOUT):
+        stats = get_healthcheck_database().command(_DB_STATS_COMMAND)
+    _HEALTH_CACHE["stats"] = _database_stats(stats)
+    return _HEALTH_CACHE["stats"]
+
+
+def _refresh_database_stats_forever() -> None:
+    """Background loop keeping the cached database statistics fresh"""
+    while True:
+        try:
+            _refresh_database_stats()
+        except Exception as e:
+            logger.warning("Database stats refresh failed: %s", e)
+        time.sleep(_STATS_REFRESH_INTERVAL)
+
+
+def _start_stats_refresher() -> None:
+    """Start the stats refresh thread once per process"""
+    global _stats_refresher
+    
+    if _stats_refresher is None:
+        with _stats_refresher_lock:
+            if _stats_refresher is None:
+                _stats_refresher = threading.Thread(
+                    target=_refresh_database_stats_forever,
+                    name="db-stats-refresher",
+                    daemon=True
+                )
+                _stats_refresher.start()
+
 
 class SystemService:
     """Service for system operations"""
     
-    def health_check(self) -> dict:
-        """Perform system health check"""
+    def __init__(self):
+        self._db = None
+        _start_stats_refresher()
+    
+    @property
+    def db(self):
+        """Health-check database handle, resolved on first use"""
+        if self._db is None:
+            self._db = get_healthcheck_database()
+        return self._db
+    
+    def _cached_health(self) -> Optional[Mapping]:
+        """Return the cached healthy result if it is still within the TTL"""
+        if _HEALTH_CACHE["value"] is not None and time.monotonic() - _HEALTH_CACHE["ts"] < _HEALTH_CACHE_TTL:
+            return _HEALTH_CACHE["value"]
+        return None
+    
+    def _topology_connected(self) -> bool:
+        """Whether the driver's server monitors currently see a reachable server; no network I/O"""
         try:
-            # Check database connectivity
-            db = get_sync_database()
-            stats = db.command("dbStats")
+            return bool(self.db.client.topology_description.known_servers)
+        except Exception:
+            return False
+    
+    def _fast_health(self, verbose: bool, probe: str) -> Optional[Mapping]:
+        """Answer from in-memory state when the probe allows it: driver topology, then the cached ping"""
+        if verbose or probe == "stats":
+            return None
+        
+        if probe == "topology" and self._topology_connected():
+            _HEALTH_CACHE["last_good"] = _HEALTHY_RESPONSE
+            _HEALTH_CACHE["last_good_ts"] = time.monotonic()
+            return _HEALTHY_RESPONSE
+        
+        return self._cached_health()
+    
+    async def health_check_async(self, verbose: bool = False, probe: str = "topology") -> Mapping:
+        """Health check for async callers: in-memory answers return inline, database checks run in a worker thread"""
+        result = self._fast_health(verbose, probe)
+        if result is not None:
+            return result
+        return await asyncio.to_thread(self.health_check, verbose, probe)
+    
+    def health_check(self, verbose: bool = False, probe: str = "topology") -> Mapping:
+        """
+        Perform system health check.
+        
+        probe escalates from the driver's topology state ("topology") to a ping ("ping")
+        or a ping plus the background-refreshed database statistics ("stats"); verbose is
+        equivalent to probe="stats". An unknown topology falls back to a ping.
+        """
+        if verbose or probe == "stats":
+            return self._run_health_check(verbose=True)
+        
+        cached = self._fast_health(verbose, probe)
+        if cached is not None:
+            return cached
+        
+        with _HEALTH_FLIGHT_LOCK:
+            # Another caller may have refreshed the cache while this one waited
+            cached = self._cached_health()
+            if cached is not None:
+                return cached
             
-            return {
-                "status": "healthy",
-                "database": "connected",
-                "database_stats": {
-                    "collections": stats.get("collections", 0),
-                    "data_size": stats.get("dataSize", 0),
-                    "storage_size": stats.get("storageSize", 0)
-                }
-            }
+            inflight = _HEALTH_INFLIGHT["future"]
+            is_leader = inflight is None
+            if is_leader:
+                inflight = _HEALTH_INFLIGHT["future"] = Future()
+        
+        if not is_leader:
+            return inflight.result()
+        
+        try:
+            result = self._run_health_check(verbose=False)
+            inflight.set_result(result)
+            return result
+        except BaseException as e:
+            inflight.set_exception(e)
+            raise
+        finally:
+            with _HEALTH_FLIGHT_LOCK:
+                _HEALTH_INFLIGHT["future"] = None
+    
+    def _run_health_check(self, verbose: bool) -> Mapping:
+        """Check the database and update the health cache"""
+        try:
+            # Check database connectivity; a degraded server fails fast instead of hanging the probe.
+            # pymongo.timeout also sends each command a maxTimeMS from the remaining budget.
+            with pymongo.timeout(_HEALTH_TIMEOUT):
+                self.db.command("ping")
+            
+            now = time.monotonic()
+            if verbose:
+                # Only the first verbose check before the refresher has run pays for dbStats
+                database_stats = _HEALTH_CACHE["stats"] or _refresh_database_stats()
+                result = MappingProxyType({**_HEALTHY_TEMPLATE, "database_stats": database_stats})
+            else:
+                result = _HEALTHY_RESPONSE
+                _HEALTH_CACHE["value"] = result
+                _HEALTH_CACHE["ts"] = now
+            _HEALTH_CACHE["last_good"] = result
+            _HEALTH_CACHE["last_good_ts"] = now
+            
+            return result
         except Exception as e:
-            logger.error(f"Health check failed: {e}")
+            logger.error("Health check failed: %s", e)
+            
+            # Ride out brief blips (elections, network hiccups) on a recent healthy result
+            last_good = _HEALTH_CACHE["last_good"]
+            if last_good is not None and time.monotonic() - _HEALTH_CACHE["last_good_ts"] < _HEALTH_GRACE_PERIOD:
+                degraded = {**last_good, "status": "degraded", "database": "disconnected", "error": str(e)}
+                if not verbose:
+                    # A non-verbose probe never reports dbStats, even if the last good result was verbose
+                    degraded.pop("database_stats", None)
+                return degraded
+            
             return {
                 "status": "unhealthy",
                 "database": "disconnected",
                 "error": str(e)
             }
+    
+    def metrics(self) -> str:
+        """Format the cached health result as Prometheus text; never runs dbStats itself"""
+        health = self.health_check()
+        status = health["status"]
+        
+        lines = [
+            "# HELP app_health Whether the last health check reached the database (1) or not (0)",
+            "# TYPE app_health gauge",
+            f'app_health{{status="{status}"}} {1 if status == "healthy" else 0}'
+        ]
+        
+        # Database sizes as of the last background refresh
+        stats = _HEALTH_CACHE["stats"]
+        if stats is not None:
+            lines.extend([
+                "# TYPE mongodb_collections gauge",
+                f"mongodb_collections {stats['collections']}",
+                "# TYPE mongodb_data_size_bytes gauge",
+                f"mongodb_data_size_bytes {stats['data_size']}",
+                "# TYPE mongodb_storage_size_bytes gauge",
+                f"mongodb_storage_size_bytes {stats['storage_size']}"
+            ])
+        
+        return "\n".join(lines) + "\n"
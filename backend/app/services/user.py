@@ -4,23 +4,198 @@ Handles user operations, document management, and analysis tracking
 """
 
 import os
-import hashlib
 import re
+import threading
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 import logging
 
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from app.models.schemas import (
     User, UserCreate, UserUpdate, UserResponse, UserRole, UserStats,
     Document, DocumentCreate, DocumentUpdate, DocumentResponse, DocumentStatus, DocumentStats,
     AnalysisResult, AnalysisResultCreate, AnalysisResultResponse, AnalysisStats
 )
+from app.repositories.analysis_repository import create_analysis_indexes
 from app.repositories.connection import get_sync_database
+from app.repositories.document_repository import create_document_indexes
+from app.utils.checksum import calculate_file_checksum, find_duplicate_document, needs_duplicate_lookup
+from app.utils.text import HAS_DIGIT
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# FOCUSED financial metrics patterns - key metrics only, tried in order per metric
+_FINANCIAL_PATTERNS = {
+    # Revenue patterns - simplified
+    "revenue": [
+        re.compile(r"(?:revenue|sales|total revenue).*?(\$[\d,]+(?:\.\d*)?[BMK]?)", re.IGNORECASE),
+        re.compile(r"(?:revenue|sales).*?(?<!\d)(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)", re.IGNORECASE)
+    ],
+    # Operating Income patterns - simplified
+    "operating_income": [
+        re.compile(r"(?:operating income|operating profit|ebit).*?(\$[\d,]+(?:\.\d*)?[BMK]?)", re.IGNORECASE),
+        re.compile(r"(?:operating income|operating profit).*?(?<!\d)(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)", re.IGNORECASE)
+    ],
+    # Net Income patterns - simplified
+    "net_income": [
+        re.compile(r"(?:net income|net profit|net earnings).*?(\$[\d,]+(?:\.\d*)?[BMK]?)", re.IGNORECASE),
+        re.compile(r"(?:net income|net profit).*?(?<!\d)(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)", re.IGNORECASE)
+    ],
+    # Cash patterns - simplified
+    "cash": [
+        re.compile(r"(?:cash|cash equivalents).*?(\$[\d,]+(?:\.\d*)?[BMK]?)", re.IGNORECASE),
+        re.compile(r"(?:cash|cash equivalents).*?(?<!\d)(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)", re.IGNORECASE)
+    ],
+    # Free Cash Flow patterns - simplified
+    "free_cash_flow": [
+        re.compile(r"(?:free cash flow|fcf).*?(\$[\d,]+(?:\.\d*)?[BMK]?)", re.IGNORECASE),
+        re.compile(r"(?:free cash flow|fcf).*?(?<!\d)(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)", re.IGNORECASE)
+    ],
+    # Operating Margin patterns - simplified
+    "operating_margin": [
+        re.compile(r"(?:operating margin).*?(?<!\d)(\d+(?:\.\d+)?%)", re.IGNORECASE),
+        re.compile(r"(?:operating margin).*?(?<!\d)(\d+(?:\.\d{2})?)\s*%", re.IGNORECASE)
+    ],
+    # Net Margin patterns - simplified
+    "net_margin": [
+        re.compile(r"(?:net margin).*?(?<!\d)(\d+(?:\.\d+)?%)", re.IGNORECASE),
+        re.compile(r"(?:net margin).*?(?<!\d)(\d+(?:\.\d{2})?)\s*%", re.IGNORECASE)
+    ]
+}
+
+# FOCUSED percentage changes - key growth metrics only
+_PERCENTAGE_CHANGE_PATTERNS = {
+    "revenue_change": [
+        re.compile(r"(?:revenue|sales).*?(?:growth|increase|decrease|decline).*?(?<!\d)(\d+(?:\.\d+)?%)", re.IGNORECASE),
+        re.compile(r"(?:revenue|sales).*?(?<!\d)(\d+(?:\.\d+)?%)\s*(?:growth|increase|decrease|decline)", re.IGNORECASE)
+    ],
+    "income_change": [
+        re.compile(r"(?:operating income|net income|profit).*?(?:growth|increase|decrease|decline).*?(?<!\d)(\d+(?:\.\d+)?%)", re.IGNORECASE),
+        re.compile(r"(?:operating income|net income|profit).*?(?<!\d)(\d+(?:\.\d+)?%)\s*(?:growth|increase|decrease|decline)", re.IGNORECASE)
+    ],
+    "growth_rate": [
+        re.compile(r"(?:growth|yoy|year-over-year).*?(?<!\d)(\d+(?:\.\d+)?%)", re.IGNORECASE),
+        re.compile(r"(?<!\d)(\d+(?:\.\d+)?%)\s*(?:growth|yoy)", re.IGNORECASE)
+    ]
+}
+
+# Fallback extraction: all monetary values and percentages, classified by their context
+_MONETARY_PATTERNS = [
+    re.compile(r'\$[\d,]+(?:\.\d*)?[BMK]?', re.IGNORECASE),  # $1.2B, $500M, $1,234.56K
+    re.compile(r'\$[\d,]+(?:\.\d*)?', re.IGNORECASE),        # $1,234.56
+    re.compile(r'(?<![\d,])[\d,]+(?:\.\d*)?\s*(?:million|billion|thousand|M|B|K)', re.IGNORECASE),  # 1.2 billion, 500M
+]
+_PERCENTAGE_PATTERNS = [
+    re.compile(r'(?<!\d)\d+(?:\.\d+)?%', re.IGNORECASE),  # 15.5%, 100%
+    re.compile(r'(?<!\d)\d+(?:\.\d+)?\s*percent', re.IGNORECASE),  # 15.5 percent
+]
+_NUMBER_RE = re.compile(r'\d+(?:,\d{3})*(?:\.\d{2})?')  # 1,234.56
+
+# Every extraction pattern needs a digit, and most also a '$', '%' or 'percent'; patterns whose
+# literal is missing from a summary are skipped instead of scanning it for nothing
+_EXTRACTION_PATTERNS = frozenset(
+    [pattern for patterns in _FINANCIAL_PATTERNS.values() for pattern in patterns]
+    + [pattern for patterns in _PERCENTAGE_CHANGE_PATTERNS.values() for pattern in patterns]
+    + _MONETARY_PATTERNS
+    + _PERCENTAGE_PATTERNS
+)
+_PATTERNS_BY_LITERAL = {
+    '$': frozenset(pattern for pattern in _EXTRACTION_PATTERNS if '\\$' in pattern.pattern),
+    'percent': frozenset(pattern for pattern in _EXTRACTION_PATTERNS if 'percent' in pattern.pattern),
+    '%': frozenset(pattern for pattern in _EXTRACTION_PATTERNS if '%' in pattern.pattern),
+}
+
+
+def _unmatchable_patterns(text: str) -> frozenset:
+    """Extraction patterns that cannot match the text because a required digit or literal is absent"""
+    if _NUMBER_RE.search(text) is None:
+        return _EXTRACTION_PATTERNS
+    text_lower = text.lower()
+    return frozenset().union(*(
+        patterns for literal, patterns in _PATTERNS_BY_LITERAL.items() if literal not in text_lower
+    ))
+
+
+# Keywords that route summary lines into insights, findings, highlights, risks and opportunities
+_INSIGHT_KEYWORDS = ('revenue', 'profit', 'growth', 'margin', 'cash', 'debt')
+_FINDING_KEYWORDS = ('key finding', 'highlight', 'important', 'critical')
+_TREND_KEYWORDS = ('growth', 'decline', 'increase', 'decrease')
+_FINANCIAL_KEYWORDS = ('revenue', 'profit', 'income', 'cash', 'debt', 'growth', 'decline', 'increase', 'decrease', 'margin')
+_RISK_KEYWORDS = ('risk', 'uncertainty', 'challenge', 'concern', 'volatility', 'decline', 'decrease', 'down', 'fell', 'dropped')
+_OPPORTUNITY_KEYWORDS = ('opportunity', 'growth', 'expansion', 'increase', 'up', 'positive', 'strong', 'robust', 'rose', 'gained')
+
+# Context keywords the fallback extraction uses to label values and pick highlight lines
+_REVENUE_CONTEXT = ('revenue', 'sales', 'income')
+_NET_INCOME_CONTEXT = ('profit', 'earnings', 'net income')
+_CASH_CONTEXT = ('cash', 'liquidity')
+_DEBT_CONTEXT = ('debt', 'liability', 'borrowing')
+_MARGIN_CONTEXT = ('margin', 'profitability')
+_GROWTH_CONTEXT = ('growth', 'increase', 'decrease')
+_HIGHLIGHT_LINE_KEYWORDS = ('revenue', 'sales', 'profit', 'income', 'cash', 'debt', 'margin', 'growth', 'earnings')
+_MAGNITUDE_KEYWORDS = ('million', 'billion', 'thousand', 'M', 'B', 'K')
+_INSIGHT_LINE_KEYWORDS = ('revenue', 'profit', 'growth', 'margin', 'cash', 'debt', 'earnings', 'income')
+
+# Metric slots the fallback fills from monetary values and from percentages; a scan stops once its slots are set
+_MONETARY_METRIC_KEYS = frozenset({'revenue', 'net_income', 'cash', 'debt'})
+_PERCENTAGE_METRIC_KEYS = frozenset({'gross_margin', 'growth_rate'})
+
+# Fields DocumentResponse is built from; metadata and checksum are left on the server
+_DOCUMENT_RESPONSE_PROJECTION = {
+    "user_id": 1, "file_name": 1, "file_path": 1, "file_size_mb": 1, "file_format": 1,
+    "category": 1, "tags": 1, "status": 1, "progress": 1, "processing_duration_sec": 1,
+    "analysis_ids": 1, "created_at": 1, "updated_at": 1
+}
+
+# Fields AnalysisResultResponse is built from; error_logs is left on the server
+_ANALYSIS_RESPONSE_PROJECTION = {
+    "document_id": 1, "user_id": 1, "analysis_type": 1, "query": 1, "output": 1,
+    "confidence_score": 1, "data_quality_score": 1, "validation_status": 1,
+    "processing_time_sec": 1, "created_at": 1
+}
+
+# Aggregation stages that join each analysis result to its document's file name as document_name;
+# the let/$expr form runs on MongoDB 3.6+ (localField together with pipeline needs 5.0)
+_DOCUMENT_NAME_LOOKUP = [
+    {"$lookup": {
+        "from": "documents",
+        "let": {"document_id": "$document_id"},
+        "pipeline": [
+            {"$match": {"$expr": {"$eq": ["$_id", "$$document_id"]}}},
+            {"$project": {"_id": 0, "file_name": 1}}
+        ],
+        "as": "_document"
+    }},
+    {"$addFields": {"document_name": {"$arrayElemAt": ["$_document.file_name", 0]}}},
+    {"$project": {"_document": 0}}
+]
+
+
+def _document_to_response(doc: Dict[str, Any]) -> DocumentResponse:
+    """Build the listing response for a document fetched with _DOCUMENT_RESPONSE_PROJECTION"""
+    return DocumentResponse(
+        id=str(doc["_id"]),
+        user_id=str(doc["user_id"]),
+        file_name=doc["file_name"],
+        file_path=doc["file_path"],
+        file_size_mb=doc["file_size_mb"],
+        file_format=doc["file_format"],
+        category=doc.get("category"),
+        tags=doc.get("tags", []),
+        status=doc["status"],
+        progress=doc["progress"],
+        processing_duration_sec=doc.get("processing_duration_sec"),
+        analysis_ids=list(map(str, doc.get("analysis_ids", ()))),
+        created_at=doc["created_at"],
+        updated_at=doc["updated_at"]
+    )
+
+
+# Database handle shared by every UserService, resolved once the connection is up
+_db = None
+_db_lock = threading.Lock()
+
 class UserService:
     """Service for managing users and their related data"""
     
@@ -32,9 +207,18 @@ class UserService:
         self._initialize_collections()
     
     def _initialize_collections(self):
-        """Initialize database collections"""
+        """Initialize database collections from the shared database handle"""
+        global _db
+        
         try:
-            self.db = get_sync_database()
+            if _db is None:
+                with _db_lock:
+                    if _db is None:
+                        db = get_sync_database()
+                        if db is not None:
+                            self._create_indexes(db)
+                        _db = db
+            self.db = _db
             if self.db is not None:
                 self.users_collection = self.db['users']
                 self.documents_collection = self.db['documents']
@@ -51,14 +235,16 @@ class UserService:
             self.documents_collection = None
             self.analysis_results_collection = None
     
+    def _create_indexes(self, db):
+        """Create the indexes backing the listing and lookup queries; each repository owns its definitions"""
+        create_analysis_indexes(db['analysis_results'])
+        # create_document relies on the checksum index to reject duplicates, falling back to a lookup without it
+        create_document_indexes(db['documents'])
+    
     def calculate_file_checksum(self, file_path: str) -> str:
-        """Calculate SHA256 checksum of a file"""
+        """Calculate the content checksum of a file (BLAKE3, or SHA256 without blake3)"""
         try:
-            sha256_hash = hashlib.sha256()
-            with open(file_path, "rb") as f:
-                for byte_block in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(byte_block)
-            return f"sha256:{sha256_hash.hexdigest()}"
+            return calculate_file_checksum(file_path)
         except Exception as e:
             logger.error(f"Error calculating checksum: {e}")
             return ""
@@ -67,11 +253,12 @@ class UserService:
         """Extract structured financial data points from analysis summary - CONCISE and FOCUSED"""
         try:
             # Enforce 200-word limit on summary
-            words = summary_text.split()
+            # Split off at most 201 pieces; a 201st only exists when the summary is longer
+            words = summary_text.split(None, 200)
             if len(words) > 200:
                 # Truncate to 200 words and add ellipsis
                 summary_text = ' '.join(words[:200]) + "... [truncated to 200 words]"
-                logger.warning(f"Summary exceeded 200 words ({len(words)}), truncated to 200 words")
+                logger.warning("Summary exceeded 200 words, truncated to 200 words")
             data_points = {
                 "metrics": {},
                 "insights": [],
@@ -81,133 +268,96 @@ class UserService:
                 "opportunities": []
             }
             
-            # FOCUSED financial metrics patterns - key metrics only
-            financial_patterns = {
-                # Revenue patterns - simplified
-                "revenue": [
-                    r"(?:revenue|sales|total revenue).*?(\$[\d,]+\.?\d*[BMK]?)",
-                    r"(?:revenue|sales).*?(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)"
-                ],
-                # Operating Income patterns - simplified
-                "operating_income": [
-                    r"(?:operating income|operating profit|ebit).*?(\$[\d,]+\.?\d*[BMK]?)",
-                    r"(?:operating income|operating profit).*?(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)"
-                ],
-                # Net Income patterns - simplified
-                "net_income": [
-                    r"(?:net income|net profit|net earnings).*?(\$[\d,]+\.?\d*[BMK]?)",
-                    r"(?:net income|net profit).*?(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)"
-                ],
-                # Cash patterns - simplified
-                "cash": [
-                    r"(?:cash|cash equivalents).*?(\$[\d,]+\.?\d*[BMK]?)",
-                    r"(?:cash|cash equivalents).*?(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)"
-                ],
-                # Free Cash Flow patterns - simplified
-                "free_cash_flow": [
-                    r"(?:free cash flow|fcf).*?(\$[\d,]+\.?\d*[BMK]?)",
-                    r"(?:free cash flow|fcf).*?(\d+(?:,\d{3})*(?:\.\d{2})?)\s*(?:million|billion|thousand|M|B|K)"
-                ],
-                # Operating Margin patterns - simplified
-                "operating_margin": [
-                    r"(?:operating margin).*?(\d+(?:\.\d+)?%)",
-                    r"(?:operating margin).*?(\d+(?:\.\d{2})?)\s*%"
-                ],
-                # Net Margin patterns - simplified
-                "net_margin": [
-                    r"(?:net margin).*?(\d+(?:\.\d+)?%)",
-                    r"(?:net margin).*?(\d+(?:\.\d{2})?)\s*%"
-                ]
-            }
+            skipped_patterns = _unmatchable_patterns(summary_text)
             
             # Extract metrics using multiple patterns for each metric
-            for metric_name, patterns in financial_patterns.items():
+            for metric_name, patterns in _FINANCIAL_PATTERNS.items():
                 for pattern in patterns:
-                    matches = re.findall(pattern, summary_text, re.IGNORECASE)
-                    if matches:
-                        data_points["metrics"][metric_name] = matches[0]
+                    if pattern in skipped_patterns:
+                        continue
+                    match = pattern.search(summary_text)
+                    if match:
+                        data_points["metrics"][metric_name] = match.group(1)
                         break  # Use first match found
             
-            # FOCUSED percentage changes - key growth metrics only
-            percentage_patterns = {
-                "revenue_change": [
-                    r"(?:revenue|sales).*?(?:growth|increase|decrease|decline).*?(\d+(?:\.\d+)?%)",
-                    r"(?:revenue|sales).*?(\d+(?:\.\d+)?%)\s*(?:growth|increase|decrease|decline)"
-                ],
-                "income_change": [
-                    r"(?:operating income|net income|profit).*?(?:growth|increase|decrease|decline).*?(\d+(?:\.\d+)?%)",
-                    r"(?:operating income|net income|profit).*?(\d+(?:\.\d+)?%)\s*(?:growth|increase|decrease|decline)"
-                ],
-                "growth_rate": [
-                    r"(?:growth|yoy|year-over-year).*?(\d+(?:\.\d+)?%)",
-                    r"(\d+(?:\.\d+)?%)\s*(?:growth|yoy)"
-                ]
-            }
-            
-            for change_name, patterns in percentage_patterns.items():
+            # Extract percentage changes
+            for change_name, patterns in _PERCENTAGE_CHANGE_PATTERNS.items():
                 for pattern in patterns:
-                    matches = re.findall(pattern, summary_text, re.IGNORECASE)
-                    if matches:
-                        data_points["metrics"][change_name] = matches[0]
+                    if pattern in skipped_patterns:
+                        continue
+                    match = pattern.search(summary_text)
+                    if match:
+                        data_points["metrics"][change_name] = match.group(1)
                         break  # Use first match found
             
-            # Extract FOCUSED insights - limit to most important items
+            # Extract FOCUSED insights, findings, highlights, risks and opportunities in one pass over the lines
             lines = summary_text.split('\n')
             max_insights = 5
             max_findings = 3
+            max_highlights = 3
+            max_risks = 3
+            max_opportunities = 3
             
             for line in lines:
                 line = line.strip()
-                if not line or len(line) < 20:  # Skip very short lines
+                if len(line) < 20:  # Skip very short lines
                     continue
                 
+                line_lower = line.lower()
+                has_digit = HAS_DIGIT(line) is not None
+                has_dollar_or_pct = '$' in line or '%' in line
+                is_statement = len(line) > 20 and len(line) < 200
+                snippet = line[:120]
+                
+                # Duplicates are skipped as they are found, so they never take a slot
                 # Extract bullet points and key statements - more selective
                 if (line.startswith('-') or line.startswith('•')) and len(line) > 30 and len(data_points["insights"]) < max_insights:
                     insight = line[1:].strip()
                     # Only include insights with numbers or specific metrics
-                    if any(char.isdigit() for char in insight) or any(word in insight.lower() for word in ['revenue', 'profit', 'growth', 'margin', 'cash', 'debt']):
-                        data_points["insights"].append(insight[:100])  # Limit length
+                    if has_digit or any(word in line_lower for word in _INSIGHT_KEYWORDS):
+                        insight = insight[:100]  # Limit length
+                        if insight not in data_points["insights"]:
+                            data_points["insights"].append(insight)
                 
                 # Extract key findings - only quantitative or strategic
-                if any(keyword in line.lower() for keyword in ['key finding', 'highlight', 'important', 'critical']) and len(data_points["key_findings"]) < max_findings:
-                    if len(line) > 20 and len(line) < 200 and ('$' in line or '%' in line or any(word in line.lower() for word in ['growth', 'decline', 'increase', 'decrease'])):
-                        data_points["key_findings"].append(line[:120])
-            
-            # Extract financial highlights - only lines with specific numbers (limit to 3)
-            max_highlights = 3
-            financial_keywords = ['revenue', 'profit', 'income', 'cash', 'debt', 'growth', 'decline', 'increase', 'decrease', 'margin']
-            for line in lines:
-                line = line.strip()
+                if len(data_points["key_findings"]) < max_findings and any(keyword in line_lower for keyword in _FINDING_KEYWORDS):
+                    if is_statement and (has_dollar_or_pct or any(word in line_lower for word in _TREND_KEYWORDS)):
+                        if snippet not in data_points["key_findings"]:
+                            data_points["key_findings"].append(snippet)
+                
+                # Extract financial highlights - only lines with specific numbers
                 if (len(data_points["financial_highlights"]) < max_highlights and
-                    any(keyword in line.lower() for keyword in financial_keywords) and 
-                    len(line) > 20 and len(line) < 200 and 
-                    ('$' in line or '%' in line) and
-                    any(char.isdigit() for char in line)):
-                    data_points["financial_highlights"].append(line[:120])
-            
-            # Extract risks and opportunities - more focused (limit to 3 each)
-            max_risks = 3
-            max_opportunities = 3
-            risk_keywords = ['risk', 'uncertainty', 'challenge', 'concern', 'volatility', 'decline', 'decrease', 'down', 'fell', 'dropped']
-            opportunity_keywords = ['opportunity', 'growth', 'expansion', 'increase', 'up', 'positive', 'strong', 'robust', 'rose', 'gained']
-            
-            for line in lines:
-                line = line.strip()
-                if len(line) > 20 and len(line) < 200:
+                    is_statement and has_dollar_or_pct and has_digit and
+                    any(keyword in line_lower for keyword in _FINANCIAL_KEYWORDS) and
+                    snippet not in data_points["financial_highlights"]):
+                    data_points["financial_highlights"].append(snippet)
+                
+                # Extract risks and opportunities - more focused
+                if is_statement:
                     if (len(data_points["risks"]) < max_risks and 
-                        any(keyword in line.lower() for keyword in risk_keywords)):
-                        data_points["risks"].append(line[:120])
+                        any(keyword in line_lower for keyword in _RISK_KEYWORDS)):
+                        if snippet not in data_points["risks"]:
+                            data_points["risks"].append(snippet)
                     elif (len(data_points["opportunities"]) < max_opportunities and 
-                          any(keyword in line.lower() for keyword in opportunity_keywords)):
-                        data_points["opportunities"].append(line[:120])
+                          any(keyword in line_lower for keyword in _OPPORTUNITY_KEYWORDS)):
+                        if snippet not in data_points["opportunities"]:
+                            data_points["opportunities"].append(snippet)
+                
+                # Stop scanning once every bucket is full
+                if (len(data_points["insights"]) >= max_insights and
+                    len(data_points["key_findings"]) >= max_findings and
+                    len(data_points["financial_highlights"]) >= max_highlights and
+                    len(data_points["risks"]) >= max_risks and
+                    len(data_points["opportunities"]) >= max_opportunities):
+                    break
             
             # FALLBACK EXTRACTION: If regex patterns didn't capture enough data, use advanced extraction
             if len(data_points["metrics"]) < 5:  # If we didn't extract enough metrics
                 data_points = self._advanced_financial_extraction(summary_text, data_points)
             
-            # Clean up and deduplicate - limit to top 5 items each for focused coverage
+            # Deduplicate what the fallback added, keeping first-seen order - limit to top 5 items each for focused coverage
             for key in ["insights", "key_findings", "financial_highlights", "risks", "opportunities"]:
-                data_points[key] = list(set(data_points[key]))[:5]  # Reduced limit for focused coverage
+                data_points[key] = list(dict.fromkeys(data_points[key]))[:5]  # Reduced limit for focused coverage
             
             # Calculate confidence score based on data extraction quality
             extraction_quality = 0
@@ -240,65 +390,68 @@ class UserService:
     def _advanced_financial_extraction(self, text: str, existing_data: Dict[str, Any]) -> Dict[str, Any]:
         """Advanced fallback extraction using multiple techniques when regex patterns fail"""
         try:
-            # Extract all monetary values with context
-            monetary_patterns = [
-                r'\$[\d,]+\.?\d*[BMK]?',  # $1.2B, $500M, $1,234.56K
-                r'\$[\d,]+\.?\d*',        # $1,234.56
-                r'[\d,]+\.?\d*\s*(?:million|billion|thousand|M|B|K)',  # 1.2 billion, 500M
-            ]
-            
-            # Extract all percentages
-            percentage_patterns = [
-                r'\d+(?:\.\d+)?%',  # 15.5%, 100%
-                r'\d+(?:\.\d+)?\s*percent',  # 15.5 percent
-            ]
-            
-            # Extract all numbers that might be financial metrics
-            number_patterns = [
-                r'\d+(?:,\d{3})*(?:\.\d{2})?',  # 1,234.56
-                r'\d+(?:\.\d+)?',               # 1234.56
-            ]
+            skipped_patterns = _unmatchable_patterns(text)
+            metrics = existing_data["metrics"]
+            
+            # Lowercase once and slice contexts from it; match offsets only carry over
+            # when no character lowercases to several code points (e.g. 'İ')
+            text_lower = text.lower()
+            same_offsets = len(text_lower) == len(text)
             
             # Find all monetary values and their context
-            for pattern in monetary_patterns:
-                matches = re.finditer(pattern, text, re.IGNORECASE)
+            for pattern in _MONETARY_PATTERNS:
+                if _MONETARY_METRIC_KEYS <= metrics.keys():
+                    break
+                if pattern in skipped_patterns:
+                    continue
+                matches = pattern.finditer(text)
                 for match in matches:
                     value = match.group()
                     # Get context around the value (50 characters before and after)
                     start = max(0, match.start() - 50)
                     end = min(len(text), match.end() + 50)
-                    context = text[start:end].lower()
+                    context = text_lower[start:end] if same_offsets else text[start:end].lower()
                     
                     # Try to identify what this value represents
-                    if any(word in context for word in ['revenue', 'sales', 'income']):
+                    if any(word in context for word in _REVENUE_CONTEXT):
                         if 'revenue' not in existing_data["metrics"]:
                             existing_data["metrics"]["revenue"] = value
-                    elif any(word in context for word in ['profit', 'earnings', 'net income']):
+                    elif any(word in context for word in _NET_INCOME_CONTEXT):
                         if 'net_income' not in existing_data["metrics"]:
                             existing_data["metrics"]["net_income"] = value
-                    elif any(word in context for word in ['cash', 'liquidity']):
+                    elif any(word in context for word in _CASH_CONTEXT):
                         if 'cash' not in existing_data["metrics"]:
                             existing_data["metrics"]["cash"] = value
-                    elif any(word in context for word in ['debt', 'liability', 'borrowing']):
+                    elif any(word in context for word in _DEBT_CONTEXT):
                         if 'debt' not in existing_data["metrics"]:
                             existing_data["metrics"]["debt"] = value
+                    
+                    if _MONETARY_METRIC_KEYS <= metrics.keys():
+                        break
             
             # Find all percentages and their context
-            for pattern in percentage_patterns:
-                matches = re.finditer(pattern, text, re.IGNORECASE)
+            for pattern in _PERCENTAGE_PATTERNS:
+                if _PERCENTAGE_METRIC_KEYS <= metrics.keys():
+                    break
+                if pattern in skipped_patterns:
+                    continue
+                matches = pattern.finditer(text)
                 for match in matches:
                     value = match.group()
                     start = max(0, match.start() - 50)
                     end = min(len(text), match.end() + 50)
-                    context = text[start:end].lower()
+                    context = text_lower[start:end] if same_offsets else text[start:end].lower()
                     
                     # Try to identify what this percentage represents
-                    if any(word in context for word in ['margin', 'profitability']):
+                    if any(word in context for word in _MARGIN_CONTEXT):
                         if 'gross_margin' not in existing_data["metrics"]:
                             existing_data["metrics"]["gross_margin"] = value
-                    elif any(word in context for word in ['growth', 'increase', 'decrease']):
+                    elif any(word in context for word in _GROWTH_CONTEXT):
                         if 'growth_rate' not in existing_data["metrics"]:
                             existing_data["metrics"]["growth_rate"] = value
+                    
+                    if _PERCENTAGE_METRIC_KEYS <= metrics.keys():
+                        break
             
             # Extract any remaining numbers that look like financial data
             lines = text.split('\n')
@@ -306,15 +459,13 @@ class UserService:
                 line = line.strip()
                 if len(line) > 10 and len(line) < 200:
                     # Look for lines with numbers and financial keywords
-                    if any(char.isdigit() for char in line) and any(word in line.lower() for word in 
-                        ['revenue', 'sales', 'profit', 'income', 'cash', 'debt', 'margin', 'growth', 'earnings']):
+                    if HAS_DIGIT(line) is not None and any(word in line.lower() for word in _HIGHLIGHT_LINE_KEYWORDS):
                         
                         # Extract numbers from this line
-                        numbers = re.findall(r'\d+(?:,\d{3})*(?:\.\d{2})?', line)
+                        numbers = _NUMBER_RE.findall(line)
                         if numbers:
                             # Add as financial highlight if it contains meaningful data
-                            if '$' in line or '%' in line or any(word in line.lower() for word in 
-                                ['million', 'billion', 'thousand', 'M', 'B', 'K']):
+                            if '$' in line or '%' in line or any(word in line.lower() for word in _MAGNITUDE_KEYWORDS):
                                 existing_data["financial_highlights"].append(line[:150])
             
             # Extract insights from lines with multiple numbers (likely data-rich)
@@ -322,10 +473,9 @@ class UserService:
                 line = line.strip()
                 if len(line) > 30 and len(line) < 200:
                     # Count numbers in the line
-                    numbers = re.findall(r'\d+(?:,\d{3})*(?:\.\d{2})?', line)
+                    numbers = _NUMBER_RE.findall(line)
                     if len(numbers) >= 2:  # Lines with multiple numbers are likely insights
-                        if any(word in line.lower() for word in 
-                            ['revenue', 'profit', 'growth', 'margin', 'cash', 'debt', 'earnings', 'income']):
+                        if any(word in line.lower() for word in _INSIGHT_LINE_KEYWORDS):
                             existing_data["insights"].append(line[:150])
             
             logger.info(f"Advanced extraction added {len(existing_data['metrics'])} metrics")
@@ -335,46 +485,52 @@ class UserService:
             logger.error(f"Error in advanced financial extraction: {e}")
             return existing_data
     
+    def _duplicate_document_response(self, user_id: str, checksum: str, existing_document: dict) -> DocumentResponse:
+        """Log a duplicate upload and return the user's existing document instead"""
+        logger.warning(f"Duplicate document detected for user {user_id} with checksum {checksum}")
+        logger.info(f"Returning existing document {existing_document['_id']} instead of creating duplicate")
+        # Return existing document instead of creating duplicate
+        return DocumentResponse(
+            id=str(existing_document["_id"]),
+            user_id=str(existing_document["user_id"]),
+            file_name=existing_document["file_name"],
+            file_path=existing_document["file_path"],
+            file_size_mb=existing_document["file_size_mb"],
+            file_format=existing_document["file_format"],
+            checksum=existing_document["checksum"],
+            category=existing_document.get("category"),
+            tags=existing_document.get("tags", []),
+            status=existing_document["status"],
+            progress=existing_document["progress"],
+            processing_duration_sec=existing_document.get("processing_duration_sec"),
+            metadata=existing_document["metadata"],
+            analysis_ids=list(map(str, existing_document.get("analysis_ids", ()))),
+            created_at=existing_document["created_at"],
+            updated_at=existing_document["updated_at"]
+        )
+    
     def create_document(self, user_id: str, file_path: str, file_name: str, 
                        file_size_mb: float, file_format: str, 
                        category: Optional[str] = None, tags: List[str] = None) -> DocumentResponse:
         """Create a new document record"""
         try:
+            user_oid = ObjectId(user_id)
+            
             # Calculate checksum
             checksum = self.calculate_file_checksum(file_path)
             
-            # Check for duplicate documents (same user, same checksum)
-            existing_document = self.documents_collection.find_one({
-                "user_id": ObjectId(user_id),
-                "checksum": checksum
-            })
-            
-            if existing_document:
-                logger.warning(f"Duplicate document detected for user {user_id} with checksum {checksum}")
-                logger.info(f"Returning existing document {existing_document['_id']} instead of creating duplicate")
-                # Return existing document instead of creating duplicate
-                return DocumentResponse(
-                    id=str(existing_document["_id"]),
-                    user_id=str(existing_document["user_id"]),
-                    file_name=existing_document["file_name"],
-                    file_path=existing_document["file_path"],
-                    file_size_mb=existing_document["file_size_mb"],
-                    file_format=existing_document["file_format"],
-                    checksum=existing_document["checksum"],
-                    category=existing_document.get("category"),
-                    tags=existing_document.get("tags", []),
-                    status=existing_document["status"],
-                    progress=existing_document["progress"],
-                    processing_duration_sec=existing_document.get("processing_duration_sec"),
-                    metadata=existing_document["metadata"],
-                    analysis_ids=[str(aid) for aid in existing_document.get("analysis_ids", [])],
-                    created_at=existing_document["created_at"],
-                    updated_at=existing_document["updated_at"]
+            # Duplicates are caught by the unique (user_id, checksum) index on insert; a lookup
+            # is only needed without that index or while legacy checksums remain
+            if needs_duplicate_lookup(self.documents_collection):
+                existing_document = find_duplicate_document(
+                    self.documents_collection, user_oid, file_path, checksum, file_size_mb
                 )
+                if existing_document:
+                    return self._duplicate_document_response(user_id, checksum, existing_document)
             
             # Create document
             document_data = {
-                "user_id": ObjectId(user_id),
+                "user_id": user_oid,
                 "file_name": file_name,
                 "file_path": file_path,
                 "file_size_mb": file_size_mb,
@@ -395,13 +551,22 @@ class UserService:
             }
             
             # Insert document
-            result = self.documents_collection.insert_one(document_data)
+            try:
+                result = self.documents_collection.insert_one(document_data)
+            except DuplicateKeyError:
+                existing_document = self.documents_collection.find_one({
+                    "user_id": user_oid,
+                    "checksum": checksum
+                })
+                if existing_document is None:
+                    raise
+                return self._duplicate_document_response(user_id, checksum, existing_document)
             document_data["_id"] = result.inserted_id
             logger.info(f"New document inserted with ID: {result.inserted_id}")
             
             # Update user's document count and storage
             self.users_collection.update_one(
-                {"_id": ObjectId(user_id)},
+                {"_id": user_oid},
                 {
                     "$inc": {
                         "account.documents_uploaded_count": 1,
@@ -458,6 +623,78 @@ class UserService:
             logger.error(f"Error updating document status: {e}")
             return False
     
+    def _build_analysis_data(self, document_oid: ObjectId, user_oid: ObjectId,
+                             analysis_type: str, query: str, summary_text: str,
+                             confidence_score: float, data_quality_score: float,
+                             processing_time_sec: int) -> Dict[str, Any]:
+        """Build an analysis result record with data points extracted from its summary"""
+        # Extract structured data points from the summary
+        extracted_data = self.extract_financial_data_points(summary_text)
+        
+        # Create enhanced output with extracted data
+        enhanced_output = {
+            "summary": summary_text,
+            "metrics": extracted_data["metrics"],
+            "insights": extracted_data["insights"],
+            "key_findings": extracted_data["key_findings"],
+            "financial_highlights": extracted_data["financial_highlights"],
+            "risks": extracted_data["risks"],
+            "opportunities": extracted_data["opportunities"],
+            "extraction_quality_score": extracted_data["extraction_quality_score"],
+            "charts": []  # Placeholder for future chart generation
+        }
+        
+        # Adjust confidence score based on extraction quality
+        adjusted_confidence = min(confidence_score + (extracted_data["extraction_quality_score"] * 0.1), 1.0)
+        
+        return {
+            "document_id": document_oid,
+            "user_id": user_oid,
+            "analysis_type": analysis_type,
+            "query": query,
+            "output": enhanced_output,
+            "confidence_score": adjusted_confidence,
+            "data_quality_score": data_quality_score,
+            "validation_status": "passed",
+            "error_logs": [],
+            "processing_time_sec": processing_time_sec,
+            "created_at": datetime.utcnow()
+        }
+    
+    def _analysis_to_response(self, analysis: Dict[str, Any]) -> AnalysisResultResponse:
+        """Convert a stored analysis result to its response model"""
+        return AnalysisResultResponse(
+            id=str(analysis["_id"]),
+            document_id=str(analysis["document_id"]),
+            document_name=analysis.get("document_name"),
+            user_id=str(analysis["user_id"]),
+            analysis_type=analysis["analysis_type"],
+            query=analysis["query"],
+            output=analysis["output"],
+            confidence_score=analysis["confidence_score"],
+            data_quality_score=analysis["data_quality_score"],
+            validation_status=analysis["validation_status"],
+            processing_time_sec=analysis["processing_time_sec"],
+            created_at=analysis["created_at"]
+        )
+    
+    def _link_analysis(self, document_oid: ObjectId, user_oid: ObjectId, analysis_id: ObjectId) -> None:
+        """Attach a new analysis to its document and count it for the user"""
+        self.documents_collection.update_one(
+            {"_id": document_oid},
+            {
+                "$push": {"analysis_ids": analysis_id},
+                "$set": {"updated_at": datetime.utcnow()}
+            }
+        )
+        self.users_collection.update_one(
+            {"_id": user_oid},
+            {
+                "$inc": {"account.analyses_completed_count": 1},
+                "$set": {"updated_at": datetime.utcnow()}
+            }
+        )
+    
     def create_analysis_result(self, document_id: str, user_id: str, 
                               analysis_type: str, query: str, summary_text: str,
                               confidence_score: float, data_quality_score: float,
@@ -467,98 +704,33 @@ class UserService:
             logger.info(f"Creating analysis result for document {document_id}, user {user_id}")
             logger.info(f"Summary text length: {len(summary_text)} characters, {len(summary_text.split())} words")
             
+            document_oid = ObjectId(document_id)
+            user_oid = ObjectId(user_id)
+            
             # Check if analysis already exists for this document and user
             existing_analysis = self.analysis_results_collection.find_one({
-                "document_id": ObjectId(document_id),
-                "user_id": ObjectId(user_id),
+                "document_id": document_oid,
+                "user_id": user_oid,
                 "query": query
             })
             
             if existing_analysis:
                 logger.warning(f"Analysis already exists for document {document_id}, user {user_id}, query: {query}")
                 # Return existing analysis instead of creating duplicate
-                return AnalysisResultResponse(
-                    id=str(existing_analysis["_id"]),
-                    document_id=str(existing_analysis["document_id"]),
-                    user_id=str(existing_analysis["user_id"]),
-                    analysis_type=existing_analysis["analysis_type"],
-                    query=existing_analysis["query"],
-                    output=existing_analysis["output"],
-                    confidence_score=existing_analysis["confidence_score"],
-                    data_quality_score=existing_analysis["data_quality_score"],
-                    validation_status=existing_analysis["validation_status"],
-                    processing_time_sec=existing_analysis["processing_time_sec"],
-                    created_at=existing_analysis["created_at"]
-                )
-            
-            # Extract structured data points from the summary
-            extracted_data = self.extract_financial_data_points(summary_text)
-            
-            # Create enhanced output with extracted data
-            enhanced_output = {
-                "summary": summary_text,
-                "metrics": extracted_data["metrics"],
-                "insights": extracted_data["insights"],
-                "key_findings": extracted_data["key_findings"],
-                "financial_highlights": extracted_data["financial_highlights"],
-                "risks": extracted_data["risks"],
-                "opportunities": extracted_data["opportunities"],
-                "extraction_quality_score": extracted_data["extraction_quality_score"],
-                "charts": []  # Placeholder for future chart generation
-            }
+                return self._analysis_to_response(existing_analysis)
             
-            # Adjust confidence score based on extraction quality
-            adjusted_confidence = min(confidence_score + (extracted_data["extraction_quality_score"] * 0.1), 1.0)
-            
-            analysis_data = {
-                "document_id": ObjectId(document_id),
-                "user_id": ObjectId(user_id),
-                "analysis_type": analysis_type,
-                "query": query,
-                "output": enhanced_output,
-                "confidence_score": adjusted_confidence,
-                "data_quality_score": data_quality_score,
-                "validation_status": "passed",
-                "error_logs": [],
-                "processing_time_sec": processing_time_sec,
-                "created_at": datetime.utcnow()
-            }
+            analysis_data = self._build_analysis_data(
+                document_oid, user_oid, analysis_type, query, summary_text,
+                confidence_score, data_quality_score, processing_time_sec
+            )
             
             # Insert analysis result
             result = self.analysis_results_collection.insert_one(analysis_data)
             analysis_data["_id"] = result.inserted_id
             
-            # Update document with analysis ID
-            self.documents_collection.update_one(
-                {"_id": ObjectId(document_id)},
-                {
-                    "$push": {"analysis_ids": result.inserted_id},
-                    "$set": {"updated_at": datetime.utcnow()}
-                }
-            )
-            
-            # Update user's analysis count
-            self.users_collection.update_one(
-                {"_id": ObjectId(user_id)},
-                {
-                    "$inc": {"account.analyses_completed_count": 1},
-                    "$set": {"updated_at": datetime.utcnow()}
-                }
-            )
+            self._link_analysis(document_oid, user_oid, result.inserted_id)
             
-            return AnalysisResultResponse(
-                id=str(analysis_data["_id"]),
-                document_id=str(analysis_data["document_id"]),
-                user_id=str(analysis_data["user_id"]),
-                analysis_type=analysis_data["analysis_type"],
-                query=analysis_data["query"],
-                output=analysis_data["output"],
-                confidence_score=analysis_data["confidence_score"],
-                data_quality_score=analysis_data["data_quality_score"],
-                validation_status=analysis_data["validation_status"],
-                processing_time_sec=analysis_data["processing_time_sec"],
-                created_at=analysis_data["created_at"]
-            )
+            return self._analysis_to_response(analysis_data)
             
         except Exception as e:
             logger.error(f"Error creating analysis result: {e}")
@@ -575,71 +747,37 @@ class UserService:
                     return []
             
             cursor = self.documents_collection.find(
-                {"user_id": ObjectId(user_id)}
-            ).sort("created_at", -1).skip(skip).limit(limit)
-            
-            documents = []
-            for doc in cursor:
-                documents.append(DocumentResponse(
-                    id=str(doc["_id"]),
-                    user_id=str(doc["user_id"]),
-                    file_name=doc["file_name"],
-                    file_path=doc["file_path"],
-                    file_size_mb=doc["file_size_mb"],
-                    file_format=doc["file_format"],
-                    category=doc.get("category"),
-                    tags=doc.get("tags", []),
-                    status=doc["status"],
-                    progress=doc["progress"],
-                    processing_duration_sec=doc.get("processing_duration_sec"),
-                    analysis_ids=[str(aid) for aid in doc.get("analysis_ids", [])],
-                    created_at=doc["created_at"],
-                    updated_at=doc["updated_at"]
-                ))
-            
-            return documents
+                {"user_id": ObjectId(user_id)},
+                projection=_DOCUMENT_RESPONSE_PROJECTION
+            ).sort("created_at", -1).skip(skip).limit(limit).batch_size(limit)  # the whole page in one round trip
+            
+            return list(map(_document_to_response, cursor))
             
         except Exception as e:
             logger.error(f"Error getting user documents: {e}")
             return []
     
+    def _analyses_with_document_names(self, match: Dict[str, Any], skip: int = 0, limit: int = 0) -> List[AnalysisResultResponse]:
+        """Newest analyses matching the filter, paged first and then joined to their document names in one round trip"""
+        pipeline = [
+            {"$match": match},
+            {"$sort": {"created_at": -1}},
+            {"$skip": skip}
+        ]
+        if limit > 0:  # find() read a zero limit as unlimited; $limit rejects it
+            pipeline.append({"$limit": limit})
+        pipeline.append({"$project": _ANALYSIS_RESPONSE_PROJECTION})
+        
+        # A page fits in one batch; unbounded listings stream in batches of 200
+        batch_size = min(limit, 200) if limit > 0 else 200
+        cursor = self.analysis_results_collection.aggregate(pipeline + _DOCUMENT_NAME_LOOKUP, batchSize=batch_size)
+        
+        return [self._analysis_to_response(analysis) for analysis in cursor]
+    
     def get_document_analyses(self, document_id: str) -> List[AnalysisResultResponse]:
         """Get all analyses for a specific document"""
         try:
-            cursor = self.analysis_results_collection.find(
-                {"document_id": ObjectId(document_id)}
-            ).sort("created_at", -1)
-            
-            # Get document name once for all analyses
-            document_name = None
-            try:
-                document = self.documents_collection.find_one(
-                    {"_id": ObjectId(document_id)},
-                    {"file_name": 1}
-                )
-                if document:
-                    document_name = document.get("file_name")
-            except Exception as e:
-                logger.warning(f"Could not fetch document name for document {document_id}: {e}")
-            
-            analyses = []
-            for analysis in cursor:
-                analyses.append(AnalysisResultResponse(
-                    id=str(analysis["_id"]),
-                    document_id=str(analysis["document_id"]),
-                    document_name=document_name,
-                    user_id=str(analysis["user_id"]),
-                    analysis_type=analysis["analysis_type"],
-                    query=analysis["query"],
-                    output=analysis["output"],
-                    confidence_score=analysis["confidence_score"],
-                    data_quality_score=analysis["data_quality_score"],
-                    validation_status=analysis["validation_status"],
-                    processing_time_sec=analysis["processing_time_sec"],
-                    created_at=analysis["created_at"]
-                ))
-            
-            return analyses
+            return self._analyses_with_document_names({"document_id": ObjectId(document_id)})
             
         except Exception as e:
             logger.error(f"Error getting document analyses: {e}")
@@ -655,40 +793,7 @@ class UserService:
                     logger.error("Could not initialize analysis results collection")
                     return []
             
-            cursor = self.analysis_results_collection.find(
-                {"user_id": ObjectId(user_id)}
-            ).sort("created_at", -1).skip(skip).limit(limit)
-            
-            analyses = []
-            for analysis in cursor:
-                # Get document name from documents collection
-                document_name = None
-                try:
-                    document = self.documents_collection.find_one(
-                        {"_id": analysis["document_id"]},
-                        {"file_name": 1}
-                    )
-                    if document:
-                        document_name = document.get("file_name")
-                except Exception as e:
-                    logger.warning(f"Could not fetch document name for analysis {analysis['_id']}: {e}")
-                
-                analyses.append(AnalysisResultResponse(
-                    id=str(analysis["_id"]),
-                    document_id=str(analysis["document_id"]),
-                    document_name=document_name,
-                    user_id=str(analysis["user_id"]),
-                    analysis_type=analysis["analysis_type"],
-                    query=analysis["query"],
-                    output=analysis["output"],
-                    confidence_score=analysis["confidence_score"],
-                    data_quality_score=analysis["data_quality_score"],
-                    validation_status=analysis["validation_status"],
-                    processing_time_sec=analysis["processing_time_sec"],
-                    created_at=analysis["created_at"]
-                ))
-            
-            return analyses
+            return self._analyses_with_document_names({"user_id": ObjectId(user_id)}, skip, limit)
             
         except Exception as e:
             logger.error(f"Error getting user analyses: {e}")
@@ -697,16 +802,22 @@ class UserService:
     def get_user_stats(self) -> UserStats:
         """Get user statistics"""
         try:
-            total_users = self.users_collection.count_documents({})
-            active_users = self.users_collection.count_documents({"account.status": "active"})
-            admin_users = self.users_collection.count_documents({"role": "Admin"})
-            viewer_users = self.users_collection.count_documents({"role": "Viewer"})
+            # All four counts from one pass over the collection
+            counts = next(self.users_collection.aggregate([
+                {"$group": {
+                    "_id": None,
+                    "total_users": {"$sum": 1},
+                    "active_users": {"$sum": {"$cond": [{"$eq": ["$account.status", "active"]}, 1, 0]}},
+                    "admin_users": {"$sum": {"$cond": [{"$eq": ["$role", "Admin"]}, 1, 0]}},
+                    "viewer_users": {"$sum": {"$cond": [{"$eq": ["$role", "Viewer"]}, 1, 0]}}
+                }}
+            ]), {"total_users": 0, "active_users": 0, "admin_users": 0, "viewer_users": 0})
             
             return UserStats(
-                total_users=total_users,
-                active_users=active_users,
-                admin_users=admin_users,
-                viewer_users=viewer_users
+                total_users=counts["total_users"],
+                active_users=counts["active_users"],
+                admin_users=counts["admin_users"],
+                viewer_users=counts["viewer_users"]
             )
             
         except Exception as e:
@@ -716,28 +827,24 @@ class UserService:
     def get_document_stats(self) -> DocumentStats:
         """Get document statistics"""
         try:
-            total_documents = self.documents_collection.count_documents({})
-            
-            # Documents by status
-            status_pipeline = [
-                {"$group": {"_id": "$status", "count": {"$sum": 1}}}
-            ]
-            status_results = list(self.documents_collection.aggregate(status_pipeline))
-            documents_by_status = {result["_id"]: result["count"] for result in status_results}
-            
-            # Documents by format
-            format_pipeline = [
-                {"$group": {"_id": "$file_format", "count": {"$sum": 1}}}
-            ]
-            format_results = list(self.documents_collection.aggregate(format_pipeline))
-            documents_by_format = {result["_id"]: result["count"] for result in format_results}
-            
-            # Total storage
-            storage_pipeline = [
-                {"$group": {"_id": None, "total_storage": {"$sum": "$file_size_mb"}}}
-            ]
-            storage_result = list(self.documents_collection.aggregate(storage_pipeline))
-            total_storage_mb = storage_result[0]["total_storage"] if storage_result else 0.0
+            # One pass grouped by status and format; the handful of groups is pivoted here
+            total_documents = 0
+            total_storage_mb = 0.0
+            documents_by_status = {}
+            documents_by_format = {}
+            for group in self.documents_collection.aggregate([
+                {"$group": {
+                    "_id": {"status": "$status", "file_format": "$file_format"},
+                    "count": {"$sum": 1},
+                    "storage": {"$sum": "$file_size_mb"}
+                }}
+            ]):
+                status = group["_id"].get("status")
+                file_format = group["_id"].get("file_format")
+                total_documents += group["count"]
+                total_storage_mb += group["storage"]
+                documents_by_status[status] = documents_by_status.get(status, 0) + group["count"]
+                documents_by_format[file_format] = documents_by_format.get(file_format, 0) + group["count"]
             
             return DocumentStats(
                 total_documents=total_documents,
@@ -758,28 +865,34 @@ class UserService:
     def get_analysis_stats(self) -> AnalysisStats:
         """Get analysis statistics"""
         try:
-            total_analyses = self.analysis_results_collection.count_documents({})
-            
-            # Analyses by type
-            type_pipeline = [
-                {"$group": {"_id": "$analysis_type", "count": {"$sum": 1}}}
-            ]
-            type_results = list(self.analysis_results_collection.aggregate(type_pipeline))
-            analyses_by_type = {result["_id"]: result["count"] for result in type_results}
-            
-            # Average confidence score
-            confidence_pipeline = [
-                {"$group": {"_id": None, "avg_confidence": {"$avg": "$confidence_score"}}}
-            ]
-            confidence_result = list(self.analysis_results_collection.aggregate(confidence_pipeline))
-            average_confidence_score = confidence_result[0]["avg_confidence"] if confidence_result else 0.0
-            
-            # Average processing time
-            time_pipeline = [
-                {"$group": {"_id": None, "avg_time": {"$avg": "$processing_time_sec"}}}
-            ]
-            time_result = list(self.analysis_results_collection.aggregate(time_pipeline))
-            average_processing_time = time_result[0]["avg_time"] if time_result else 0.0
+            # One pass grouped by type; sums and counts of numeric values let the
+            # per-type groups be combined into the same averages $avg would give
+            total_analyses = 0
+            analyses_by_type = {}
+            confidence_sum = confidence_count = 0
+            time_sum = time_count = 0
+            for group in self.analysis_results_collection.aggregate([
+                {"$group": {
+                    "_id": "$analysis_type",
+                    "count": {"$sum": 1},
+                    "confidence_sum": {"$sum": "$confidence_score"},
+                    "confidence_count": {"$sum": {"$cond": [{"$isNumber": "$confidence_score"}, 1, 0]}},
+                    "time_sum": {"$sum": "$processing_time_sec"},
+                    "time_count": {"$sum": {"$cond": [{"$isNumber": "$processing_time_sec"}, 1, 0]}}
+                }}
+            ]):
+                total_analyses += group["count"]
+                analyses_by_type[group["_id"]] = group["count"]
+                confidence_sum += group["confidence_sum"]
+                confidence_count += group["confidence_count"]
+                time_sum += group["time_sum"]
+                time_count += group["time_count"]
+            
+            if total_analyses:
+                average_confidence_score = confidence_sum / confidence_count if confidence_count else None
+                average_processing_time = time_sum / time_count if time_count else None
+            else:
+                average_confidence_score = average_processing_time = 0.0
             
             return AnalysisStats(
                 total_analyses=total_analyses,
@@ -815,7 +928,7 @@ class UserService:
             document_doc["_id"] = str(document_doc["_id"])
             document_doc["user_id"] = str(document_doc["user_id"])
             if "analysis_ids" in document_doc and document_doc["analysis_ids"]:
-                document_doc["analysis_ids"] = [str(aid) for aid in document_doc["analysis_ids"]]
+                document_doc["analysis_ids"] = list(map(str, document_doc["analysis_ids"]))
             
             return DocumentResponse(**document_doc, id=document_doc["_id"])
         except Exception as e:
@@ -869,32 +982,7 @@ class UserService:
                 logger.warning("MongoDB not available - cannot get analyses")
                 return []
                 
-            from bson import ObjectId
-            analyses_docs = self.analysis_results_collection.find(
-                {"document_id": ObjectId(document_id)}
-            ).skip(skip).limit(limit).sort("created_at", -1).to_list(length=None)
-            
-            # Get document name once for all analyses
-            document_name = None
-            try:
-                document = self.documents_collection.find_one(
-                    {"_id": ObjectId(document_id)},
-                    {"file_name": 1}
-                )
-                if document:
-                    document_name = document.get("file_name")
-            except Exception as e:
-                logger.warning(f"Could not fetch document name for document {document_id}: {e}")
-            
-            analyses = []
-            for analysis_doc in analyses_docs:
-                # Convert ObjectIds to strings for Pydantic model
-                analysis_doc["_id"] = str(analysis_doc["_id"])
-                analysis_doc["document_id"] = str(analysis_doc["document_id"])
-                analysis_doc["user_id"] = str(analysis_doc["user_id"])
-                analysis_doc["document_name"] = document_name
-                
-                analyses.append(AnalysisResultResponse(**analysis_doc, id=analysis_doc["_id"]))
+            analyses = self._analyses_with_document_names({"document_id": ObjectId(document_id)}, skip, limit)
             
             logger.info(f"Retrieved {len(analyses)} analyses for document {document_id}")
             return analyses
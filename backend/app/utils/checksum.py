@@ -0,0 +1,135 @@
+"""
+File Checksum Utility
+Content hashes used to detect duplicate document uploads
+"""
+
+import hashlib
+import logging
+import os
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# BLAKE3 is several times faster than SHA256; checksums only need to identify
+# identical content, so the faster hash is preferred when installed
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+    logging.warning("blake3 not available. File checksums will use SHA256.")
+
+# Documents uploaded before the switch to BLAKE3 carry SHA256 checksums
+LEGACY_CHECKSUM_ALGORITHM = "sha256"
+CHECKSUM_ALGORITHM = "blake3" if BLAKE3_AVAILABLE else LEGACY_CHECKSUM_ALGORITHM
+
+CHUNK_SIZE = 1024 * 1024  # bytes read per block
+
+# Whether each documents collection still holds legacy checksums, checked once per process
+_legacy_checksums_present: Dict[str, bool] = {}
+
+# Unique index that rejects a second upload of the same content by the same user;
+# failed checksums are stored empty and exempt
+CHECKSUM_INDEX_KEYS = [("user_id", 1), ("checksum", 1)]
+
+# Whether each documents collection has the unique checksum index, checked once per process
+_checksum_index_present: Dict[str, bool] = {}
+
+# BLAKE3 hashes files from this size across all cores; the digest is the same either way
+PARALLEL_HASH_THRESHOLD = 8 * 1024 * 1024  # bytes
+
+
+def calculate_file_checksum(file_path: str, algorithm: str = CHECKSUM_ALGORITHM) -> str:
+    """Hash a file's contents, returning the digest prefixed with the algorithm name"""
+    if algorithm == "blake3" and os.path.getsize(file_path) >= PARALLEL_HASH_THRESHOLD:
+        file_hash = blake3.blake3(max_threads=blake3.blake3.AUTO)
+        file_hash.update_mmap(file_path)
+        return f"{algorithm}:{file_hash.hexdigest()}"
+    
+    file_hash = blake3.blake3() if algorithm == "blake3" else hashlib.new(algorithm)
+    # One reusable buffer read into directly, instead of a new bytes object per block
+    buffer = memoryview(bytearray(CHUNK_SIZE))
+    with open(file_path, "rb", buffering=0) as f:
+        while bytes_read := f.readinto(buffer):
+            file_hash.update(buffer[:bytes_read])
+    return f"{algorithm}:{file_hash.hexdigest()}"
+
+
+def ensure_checksum_index(collection) -> bool:
+    """Create the unique checksum index, returning whether the collection has it"""
+    try:
+        collection.create_index(
+            CHECKSUM_INDEX_KEYS,
+            unique=True,
+            partialFilterExpression={"checksum": {"$gt": ""}}
+        )
+    except Exception as e:
+        # Typically duplicate pairs left over from before the index existed
+        logger.warning(f"Could not create unique checksum index on {collection.full_name}: {e}")
+    
+    _checksum_index_present.pop(collection.full_name, None)
+    return has_checksum_index(collection)
+
+
+def has_checksum_index(collection) -> bool:
+    """Whether the unique checksum index exists, so the insert itself rejects duplicates"""
+    name = collection.full_name
+    if name not in _checksum_index_present:
+        try:
+            indexes = collection.index_information().values()
+        except Exception as e:
+            logger.warning(f"Could not list indexes on {name}: {e}")
+            return False
+        _checksum_index_present[name] = any(
+            index.get("unique") and list(index["key"]) == CHECKSUM_INDEX_KEYS for index in indexes
+        )
+    return _checksum_index_present[name]
+
+
+def needs_duplicate_lookup(collection) -> bool:
+    """Whether uploads must be looked up before insert: no unique index to catch them, or legacy checksums it cannot match"""
+    return not has_checksum_index(collection) or has_legacy_checksums(collection)
+
+
+def has_legacy_checksums(collection) -> bool:
+    """Whether duplicates may hide behind legacy checksums the unique checksum index cannot match"""
+    if CHECKSUM_ALGORITHM == LEGACY_CHECKSUM_ALGORITHM:
+        return False
+    
+    name = collection.full_name
+    if name not in _legacy_checksums_present:
+        _legacy_checksums_present[name] = collection.find_one(
+            {"checksum": {"$regex": f"^{LEGACY_CHECKSUM_ALGORITHM}:"}},
+            {"_id": 1}
+        ) is not None
+    return _legacy_checksums_present[name]
+
+
+def find_duplicate_document(collection, user_id, file_path: str, checksum: str, file_size_mb: float) -> Optional[dict]:
+    """
+    Find a document of the user's with the same content.
+    
+    Legacy SHA256 documents of the same size are fetched in the same query, and
+    the SHA256 of the upload is only computed when such a candidate exists.
+    """
+    if not checksum.startswith(f"{LEGACY_CHECKSUM_ALGORITHM}:"):
+        query = {"user_id": user_id, "$or": [
+            {"checksum": checksum},
+            {"checksum": {"$regex": f"^{LEGACY_CHECKSUM_ALGORITHM}:"}, "file_size_mb": file_size_mb}
+        ]}
+    else:
+        query = {"user_id": user_id, "checksum": checksum}
+    
+    legacy_candidates = []
+    for document in collection.find(query):
+        if document["checksum"] == checksum:
+            return document
+        legacy_candidates.append(document)
+    
+    if legacy_candidates:
+        legacy_checksum = calculate_file_checksum(file_path, LEGACY_CHECKSUM_ALGORITHM)
+        for document in legacy_candidates:
+            if document["checksum"] == legacy_checksum:
+                return document
+    
+    return None
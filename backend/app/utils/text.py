@@ -0,0 +1,9 @@
+"""
+Text Utility
+Small text scanning helpers shared by the analysis extractors
+"""
+
+import re
+
+# Bound search of a digit pattern; a C-level scan instead of a per-character generator
+HAS_DIGIT = re.compile(r'\d').search